@@ -0,0 +1,92 @@
+import weakref
+from collections import OrderedDict
+
+import pygame
+from atlas import get_atlas
+from load_image import load_image
+
+
+class FrameCache:
+    def __init__(self, budget=64 * 1024 * 1024):
+        self.budget = budget
+        self.entries = OrderedDict()
+        self.used = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, name, columns, rows, scale):
+        key = (name, columns, rows, scale)
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry[0], entry[1]
+
+        self.misses += 1
+        frames, size, sheet = self.load(name, columns, rows, scale)
+        self.put(key, frames, size, sheet)
+        return frames, size
+
+    def load(self, name, columns, rows, scale):
+        # builds frames without touching the cache, so loader threads can call it; the sheet
+        # they were cut from (None for atlas frames) goes to put() along with them
+        atlas = get_atlas()
+        packed = atlas.get(name, columns, rows, scale) if atlas else None
+        if packed is not None:
+            return packed + (None,)
+        sheet = load_image(name)
+        return self.cut_sheet(sheet, columns, rows, scale) + (sheet,)
+
+    def put(self, key, frames, size, sheet=None):
+        if key in self.entries:
+            return
+        if sheet is not None:
+            record_sources(frames, size, sheet)
+        cost = sum(frame.get_width() * frame.get_height() * frame.get_bytesize() for frame in frames)
+        self.entries[key] = (frames, size, cost)
+        self.used += cost
+        self.trim()
+
+    def cut_sheet(self, sheet, columns, rows, scale):
+        size = (sheet.get_width() // columns, sheet.get_height() // rows)
+        scaled_size = (size[0] * scale, size[1] * scale)
+        converted = pygame.display.get_surface() is not None
+        frames = []
+        for j in range(rows):
+            for i in range(columns):
+                frame = sheet.subsurface(pygame.Rect((size[0] * i, size[1] * j), size))
+                frame = pygame.transform.scale(frame, scaled_size)
+                if converted:
+                    frame = frame.convert_alpha()
+                frames.append(frame)
+        return tuple(frames), size
+
+    def trim(self):
+        # the newest entry always stays, even if it alone is over budget
+        while self.used > self.budget and len(self.entries) > 1:
+            _, (_, _, cost) = self.entries.popitem(last=False)
+            self.used -= cost
+
+    def clear(self):
+        self.entries.clear()
+        self.used = 0
+
+    def stats(self):
+        return {"entries": len(self.entries), "bytes": self.used,
+                "hits": self.hits, "misses": self.misses}
+
+
+frame_sources = weakref.WeakKeyDictionary()
+frame_cache = FrameCache()
+
+
+def record_sources(frames, size, sheet):
+    # the texture renderer draws each frame as a scaled copy of its part of the sheet;
+    # called on the main thread only, when the frames are installed
+    columns = sheet.get_width() // size[0]
+    for i, frame in enumerate(frames):
+        frame_sources[frame] = (sheet, pygame.Rect((size[0] * (i % columns), size[1] * (i // columns)), size))
+
+
+def load_frames(name, columns, rows, scale=1.5):
+    return frame_cache.get(name, columns, rows, scale)
@@ -0,0 +1,263 @@
+import mmap
+import os
+import struct
+import subprocess
+import sys
+import threading
+
+import pygame
+
+ATLAS_DIR = os.path.join("data", "atlas")
+INDEX = os.path.join(ATLAS_DIR, "index.bin")
+PAGES = os.path.join(ATLAS_DIR, "pages.bin")
+MAGIC = b"PGAT"
+VERSION = 2
+PAGE_SIZE = 2048
+HEADER = struct.Struct("<4sHHI")
+PAGE = struct.Struct("<QHH")
+# key length, cell size, frame count, then the source files' newest mtime (ns) and total size at pack time
+ENTRY = struct.Struct("<HHHHqQ")
+FRAME = struct.Struct("<HHHHH")
+
+# LPC layers ship one sheet per animation, in a folder named after it
+LPC_ANIMATIONS = ("walkcycle", "slash", "thrust", "hurt")
+SHEETS = [
+    ("enemies/eyeball.png", 7, 4, 1.5),
+    ("enemies/pumpking.png", 6, 4, 1.5),
+    ("enemies/bee.png", 6, 4, 1.5),
+    ("particles/explosion.png", 12, 1, 1.5),
+    ("start/fon5.jpg", 1, 1, 1),
+]
+# the player is composited from LPC layers: the default equipment is packed already baked
+CHARACTERS = [("walkcycle", 1.5), ("slash", 1.5)]
+
+
+def make_key(name, columns, rows, scale):
+    return f"{name}|{columns}|{rows}|{float(scale)!r}"
+
+
+def source_stamp(sources):
+    # the newest mtime (ns) and the total size of the files an entry was packed from
+    stats = [os.stat(os.path.join("data", name)) for name in sources]
+    return max(stat.st_mtime_ns for stat in stats), sum(stat.st_size for stat in stats)
+
+
+def manifest(everything=False):
+    sheets = list(SHEETS)
+    if not everything:
+        return sheets
+    # with everything, each LPC layer is packed whole, so baking other equipment reads it from the atlas
+    for animation in LPC_ANIMATIONS:
+        folder = os.path.join("data", "png", animation)
+        for filename in sorted(os.listdir(folder)):
+            if filename.endswith(".png"):
+                sheets.append((f"png/{animation}/{filename}", 1, 1, 1))
+    return sheets
+
+
+def pack(sheets, directory=ATLAS_DIR, page_size=PAGE_SIZE):
+    global atlas
+    # load_image reads from the atlas: switch it off so every sheet comes from its file,
+    # not from the bundle that is about to be replaced
+    atlas = False
+    from assets import FrameCache
+    from character import CharacterCache, ANIMATIONS, EQUIPMENT, character_name
+    from load_image import load_image
+
+    cutter = FrameCache()
+    baker = CharacterCache()
+    sheets = [(name, columns, rows, scale, load_image, [name]) for name, columns, rows, scale in sheets]
+    for animation, scale in CHARACTERS:
+        columns, rows = ANIMATIONS[animation]
+        sheets.append((character_name(EQUIPMENT, animation), columns, rows, scale,
+                       lambda name, animation=animation: baker.load_sheet(EQUIPMENT, animation),
+                       baker.sources(EQUIPMENT, animation)))
+    os.makedirs(directory, exist_ok=True)
+    pages = []
+    page = None
+    x = y = shelf = 0
+    entries = []
+    for name, columns, rows, scale, load, sources in sheets:
+        sheet = load(name)
+        frames, size = cutter.cut_sheet(sheet, columns, rows, scale)
+        frame_w, frame_h = frames[0].get_size()
+        block_w, block_h = frame_w * columns, frame_h * rows
+        if block_w > page_size or block_h > page_size:
+            print(f"Лист '{name}' не помещается в атлас")
+            continue
+        # shelf packing: whole sheets go left to right, a new shelf when the row is full
+        if page is None or x + block_w > page_size:
+            x, y, shelf = 0, y + shelf, 0
+        if page is None or y + block_h > page_size:
+            page = pygame.Surface((page_size, page_size), pygame.SRCALPHA)
+            pages.append([page, 0])
+            x = y = shelf = 0
+        placed = []
+        for i, frame in enumerate(frames):
+            fx, fy = x + (i % columns) * frame_w, y + (i // columns) * frame_h
+            page.blit(frame, (fx, fy))
+            placed.append((len(pages) - 1, fx, fy, frame_w, frame_h))
+        entries.append((make_key(name, columns, rows, scale), size, placed, source_stamp(sources)))
+        x += block_w
+        shelf = max(shelf, block_h)
+        pages[-1][1] = max(pages[-1][1], y + block_h)
+
+    # pages are stored as raw BGRA (the layout convert_alpha produces), cut to their used
+    # height, so loading is a plain mmap with no decoding or conversion
+    offsets = []
+    # written next to the old files and swapped in whole, so a bundle still mapped somewhere
+    # is never truncated under it
+    with open(os.path.join(directory, "pages.bin.tmp"), "wb") as file:
+        for page, used in pages:
+            offsets.append((file.tell(), page_size, used))
+            file.write(pygame.image.tobytes(page.subsurface((0, 0, page_size, used)), "BGRA"))
+    with open(os.path.join(directory, "index.bin.tmp"), "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, len(pages), len(entries)))
+        for offset in offsets:
+            file.write(PAGE.pack(*offset))
+        for key, size, placed, source in entries:
+            key = key.encode("utf-8")
+            file.write(ENTRY.pack(len(key), size[0], size[1], len(placed), *source))
+            file.write(key)
+            for frame in placed:
+                file.write(FRAME.pack(*frame))
+    for name in ("pages.bin", "index.bin"):
+        os.replace(os.path.join(directory, name + ".tmp"), os.path.join(directory, name))
+    # the next get_atlas() opens the new bundle
+    atlas = None
+    return len(pages), len(entries)
+
+
+def open_mmap(path):
+    with open(path, "rb") as file:
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class Atlas:
+    def __init__(self, directory=ATLAS_DIR):
+        self.index = open_mmap(os.path.join(directory, "index.bin"))
+        self.data = open_mmap(os.path.join(directory, "pages.bin"))
+        magic, version, page_count, count = HEADER.unpack_from(self.index, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"unsupported atlas index in {directory}")
+        offset = HEADER.size
+        self.page_records = []
+        for _ in range(page_count):
+            self.page_records.append(PAGE.unpack_from(self.index, offset))
+            offset += PAGE.size
+        # only offsets are read up front; frame records are decoded on request
+        self.offsets = {}
+        for _ in range(count):
+            key_len, _, _, frame_count, _, _ = ENTRY.unpack_from(self.index, offset)
+            key = bytes(self.index[offset + ENTRY.size:offset + ENTRY.size + key_len]).decode("utf-8")
+            self.offsets[key] = offset
+            offset += ENTRY.size + key_len + FRAME.size * frame_count
+        self.pages = {}
+        # a sheet edited after packing is loaded from its file instead; checked once per key
+        self.fresh = {}
+        # loader workers read frames too: pages and freshness are filled in under the lock
+        self.lock = threading.Lock()
+
+    def __contains__(self, key):
+        return key in self.offsets
+
+    def page(self, i):
+        with self.lock:
+            page = self.pages.get(i)
+            if page is None:
+                offset, w, h = self.page_records[i]
+                page = self.pages[i] = pygame.image.frombuffer(
+                    memoryview(self.data)[offset:offset + w * h * 4], (w, h), "BGRA")
+        return page
+
+    def is_fresh(self, key, sources, mtime, size):
+        with self.lock:
+            fresh = self.fresh.get(key)
+            if fresh is None:
+                try:
+                    fresh = source_stamp(sources) == (mtime, size)
+                except OSError:
+                    fresh = False
+                self.fresh[key] = fresh
+        return fresh
+
+    def get(self, name, columns, rows, scale, sources=None):
+        # sources are the files under data/ the entry was packed from, by default the sheet itself
+        key = make_key(name, columns, rows, scale)
+        offset = self.offsets.get(key)
+        if offset is None:
+            return None
+        key_len, cell_w, cell_h, frame_count, mtime, size = ENTRY.unpack_from(self.index, offset)
+        if not self.is_fresh(key, sources or [name], mtime, size):
+            return None
+        offset += ENTRY.size + key_len
+        frames = []
+        for _ in range(frame_count):
+            page, x, y, w, h = FRAME.unpack_from(self.index, offset)
+            frames.append(self.page(page).subsurface((x, y, w, h)))
+            offset += FRAME.size
+        return tuple(frames), (cell_w, cell_h)
+
+
+atlas = None
+
+
+def get_atlas():
+    global atlas
+    if atlas is None:
+        if os.environ.get("NO_ATLAS") or not (os.path.isfile(INDEX) and os.path.isfile(PAGES)):
+            atlas = False
+        else:
+            try:
+                atlas = Atlas()
+            except ValueError:
+                # an index from an older version of the format: use the sheets until it is repacked
+                atlas = False
+    return atlas or None
+
+
+def measure(runs=5):
+    # cold start to first frame, each run in a fresh interpreter
+    script = (
+        "import time; start = time.perf_counter()\n"
+        "import os; os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')\n"
+        "import pygame; imported = time.perf_counter()\n"
+        "from load_image import load_image\n"
+        "from levels import LevelManager\n"
+        "from render import RenderQueue, queue_frame\n"
+        "from world import World\n"
+        "pygame.init(); screen = pygame.display.set_mode((640, 480))\n"
+        "screen.blit(load_image('start/fon5.jpg'), (0, 0))\n"
+        "font = pygame.font.Font('data/dungeon_font/ThaleahFat.ttf', 60)\n"
+        "font2 = pygame.font.Font('data/dungeon_font/ThaleahFat.ttf', 30)\n"
+        "level = LevelManager(16, preload=False).current\n"
+        "world = World(640, 480, 16, 'eyeball', level.enemy_hp, map=level.map)\n"
+        "world.step(); queue = RenderQueue(); queue_frame(queue, level.map, world, [])\n"
+        "queue.flush(screen); pygame.display.flip()\n"
+        "print(time.perf_counter() - start, time.perf_counter() - imported)\n"
+    )
+    results = {}
+    for label, env in (("sheets", {"NO_ATLAS": "1"}), ("atlas", {})):
+        times = []
+        for _ in range(runs):
+            output = subprocess.run([sys.executable, "-c", script], env=dict(os.environ, **env),
+                                    check=True, capture_output=True, text=True).stdout
+            times.append(tuple(map(float, output.split()[-2:])))
+        total, game = min(times)
+        results[label] = {"total": total, "after_import": game}
+        print(f"{label:<8}{total * 1000:>8.1f} ms to first frame, {game * 1000:.1f} ms after importing pygame"
+              f" (best of {runs})")
+    return results
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else "pack"
+    if command == "pack":
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        pygame.init()
+        pages, entries = pack(manifest("--all" in sys.argv))
+        print(f"{entries} sheets packed into {pages} pages in {ATLAS_DIR}")
+    elif command == "measure":
+        measure()
+    else:
+        print(f"Неизвестная команда '{command}', ожидается pack или measure")
@@ -0,0 +1,189 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+from pool import GCMonitor
+from levels import LevelManager
+from render import RenderQueue, TextCache, queue_frame
+from world import World, ENEMIES
+
+size = width, height = 640, 480
+tile_size = 16
+
+
+class Scene:
+    def __init__(self, level=0, enemy_type="eyeball", enemy_count=4, enemy_hp=None):
+        self.screen = pygame.display.get_surface()
+        levels = LevelManager(tile_size, preload=False)
+        levels.index = level
+        self.map = levels.current.map
+        hp = enemy_hp if enemy_hp is not None else levels.current.enemy_hp
+        # a long round, so timeouts don't end the scenario early
+        self.world = World(width, height, tile_size, enemy_type, hp, enemy_count=enemy_count,
+                           round_time=10 ** 6, map=self.map)
+        self.queue = RenderQueue()
+        self.text_cache = TextCache()
+        self.font = pygame.font.Font("data/dungeon_font/ThaleahFat.ttf", 60)
+
+    def draw(self):
+        world = self.world
+        self.screen.fill((0, 0, 0))
+        hud = [(self.text_cache.render(self.font, world.text, "white"), (32, 48)),
+               (self.text_cache.render(self.font, str(world.kills), "white"), (550, 370))]
+        queue_frame(self.queue, self.map, world, hud)
+        self.queue.flush(self.screen)
+
+    def frame(self):
+        self.world.step()
+        self.draw()
+
+
+class SlashScene(Scene):
+    def __init__(self, enemy_count=200):
+        super().__init__(enemy_count=enemy_count, enemy_hp=1)
+        self.gather()
+
+    def gather(self):
+        # pile every enemy onto the player so each slash lands
+        player = self.world.player
+        for enemy in self.world.enemy_group:
+            enemy.rect.topleft = (player.x, player.y)
+            self.world.grid.move(enemy, enemy.hitbox)
+
+    def frame(self):
+        world = self.world
+        if world.stop or not len(world.grid):
+            world.new_game()
+            self.gather()
+        world.step(slash=True)
+        self.draw()
+
+
+class RestartScene(Scene):
+    def frame(self):
+        self.world.new_game()
+        self.draw()
+
+
+def scenarios(enemy_count):
+    result = {f"map{i + 1}": (lambda i=i: Scene(level=i)) for i in range(3)}
+    for enemy_type in ENEMIES:
+        result[f"enemies-{enemy_type}"] = lambda enemy_type=enemy_type: Scene(
+            enemy_type=enemy_type, enemy_count=enemy_count)
+    result["slash-kills"] = lambda: SlashScene(enemy_count)
+    result["restart"] = RestartScene
+    return result
+
+
+def measure(scene, frames, warmup=20):
+    for _ in range(warmup):
+        scene.frame()
+
+    gc_monitor = GCMonitor().install()
+    start = time.perf_counter()
+    for _ in range(frames):
+        scene.frame()
+    elapsed = time.perf_counter() - start
+    gc_monitor.remove()
+    gc_stats = gc_monitor.stats()
+
+    # second pass under tracemalloc: how much is allocated and kept per frame
+    tracemalloc.start()
+    transient = 0
+    before = tracemalloc.take_snapshot()
+    for _ in range(frames):
+        tracemalloc.reset_peak()
+        current, _ = tracemalloc.get_traced_memory()
+        scene.frame()
+        transient += tracemalloc.get_traced_memory()[1] - current
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    growth = sum(stat.count_diff for stat in after.compare_to(before, "filename") if stat.count_diff > 0)
+
+    return {"frames": frames,
+            "fps": frames / elapsed,
+            "frame_ms": elapsed / frames * 1000,
+            "alloc_bytes_per_frame": transient / frames,
+            "retained_blocks_per_frame": growth / frames,
+            "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            "gc_collections": sum(gc_stats["collections"]),
+            "gc_pause_ms": gc_stats["pause_ms"],
+            "gc_max_pause_ms": gc_stats["max_pause_ms"],
+            "pools": scene.world.pool_stats()}
+
+
+def run_single(name, frames, enemy_count):
+    pygame.init()
+    pygame.display.set_mode(size)
+    scene = scenarios(enemy_count)[name]()
+    return measure(scene, frames)
+
+
+def run_isolated(name, frames, enemy_count):
+    # one process per scenario keeps peak RSS and caches from leaking between them
+    output = subprocess.run([sys.executable, __file__, "--single", name, "--frames", str(frames),
+                             "--enemies", str(enemy_count)],
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    print(f"{'scenario':<18}{'fps':>10}{'baseline':>10}{'change':>9}{'alloc/frame':>13}{'rss, MB':>9}{'gc':>5}")
+    for name, result in results.items():
+        base = baseline.get(name)
+        line = f"{name:<18}{result['fps']:>10.1f}"
+        if base:
+            change = result["fps"] / base["fps"] - 1
+            line += f"{base['fps']:>10.1f}{change:>+8.1%} "
+            if change < -tolerance:
+                regressions.append(name)
+        else:
+            line += f"{'-':>10}{'-':>9}"
+        line += f"{result['alloc_bytes_per_frame']:>13.0f}{result['peak_rss_kb'] / 1024:>9.1f}"
+        line += f"{result.get('gc_collections', 0):>5}"
+        print(line)
+    return regressions
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Headless performance benchmarks")
+    parser.add_argument("scenarios", nargs="*")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--enemies", type=int, default=200)
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    parser.add_argument("--single", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.single:
+        print(json.dumps(run_single(args.single, args.frames, args.enemies)))
+        return 0
+
+    names = args.scenarios or list(scenarios(args.enemies))
+    results = {name: run_isolated(name, args.frames, args.enemies) for name in names}
+    with open(args.out, "w") as file:
+        json.dump(results, file, indent=1)
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print("regressions: " + ", ".join(regressions))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
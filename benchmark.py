@@ -0,0 +1,390 @@
+import os
+import random
+import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+from assets import load_frames
+from camera import Camera
+from character import CharacterCache
+from entities import Player, Enemy
+from flowfield import FlowField
+from levels import LevelManager
+from render import RenderQueue, TextCache, queue_frame
+from spatial import SpatialHash
+from swarm import Swarm
+from texture_render import TextureRenderer
+from tilemap import Map
+from world import World
+
+size = width, height = 640, 480
+tile_size = 16
+maps = ["map1.tmx", "map2.tmx", "map3.tmx"]
+
+
+def render_per_tile(map, screen):
+    for y in range(map.height):
+        for x in range(map.width):
+            image1 = map.map.get_tile_image(x, y, 0)
+            image2 = map.map.get_tile_image(x, y, 1)
+            if image1:
+                screen.blit(image1, (x * map.tile_size, y * map.tile_size))
+            if image2:
+                screen.blit(image2, (x * map.tile_size, y * map.tile_size))
+
+
+def frame_time(render, map, screen, frames):
+    render(map, screen)
+    start = time.perf_counter()
+    for _ in range(frames):
+        screen.fill((0, 0, 0))
+        render(map, screen)
+    return (time.perf_counter() - start) / frames * 1000
+
+
+def bench_map(frames=200):
+    screen = pygame.display.get_surface()
+    print(f"{'map':<10}{'per-tile, ms':>14}{'baked, ms':>12}{'speedup':>10}")
+    for filename in maps:
+        map = Map(filename, tile_size)
+        before = frame_time(render_per_tile, map, screen, frames)
+        after = frame_time(Map.render, map, screen, frames)
+        print(f"{filename:<10}{before:>14.3f}{after:>12.3f}{before / after:>9.1f}x")
+
+
+def collide_linear(player, player_group, enemy_group):
+    pygame.sprite.spritecollideany(player, enemy_group)
+    for enemy in enemy_group:
+        pygame.sprite.spritecollideany(enemy, player_group)
+
+
+def collide_grid(player, grid, enemy_group):
+    grid.first(player.slash_area())
+    attackers = set(grid.query(player.hitbox))
+    for enemy in enemy_group:
+        enemy in attackers
+
+
+def bench_collisions(counts=(4, 50, 500, 5000), ticks=200):
+    print(f"{'enemies':<10}{'linear, us':>12}{'grid, us':>12}{'speedup':>10}")
+    for count in counts:
+        # keep the density constant: the arena grows with the number of enemies
+        side = int(max(width, (count ** 0.5) * 96))
+        rng = random.Random(count)
+        player_group = pygame.sprite.Group()
+        enemy_group = pygame.sprite.Group()
+        player = Player("BODY_skeleton.png", side / 2, side / 2, player_group)
+        player.update(None)
+        grid = SpatialHash(tile_size * 4)
+        for _ in range(count):
+            enemy = Enemy("eyeball.png", rng.randrange(side) // 2, rng.randrange(side) // 2, 7, 4, enemy_group)
+            grid.insert(enemy, enemy.hitbox)
+
+        start = time.perf_counter()
+        for _ in range(ticks):
+            collide_linear(player, player_group, enemy_group)
+        before = (time.perf_counter() - start) / ticks * 1e6
+        start = time.perf_counter()
+        for _ in range(ticks):
+            collide_grid(player, grid, enemy_group)
+        after = (time.perf_counter() - start) / ticks * 1e6
+        print(f"{count:<10}{before:>12.1f}{after:>12.1f}{before / after:>9.1f}x")
+
+
+def update_sprites(enemy_group, dt):
+    for enemy in enemy_group:
+        enemy.update(dt)
+
+
+def draw_sprites(enemy_group, screen):
+    enemy_group.draw(screen)
+    for enemy in enemy_group:
+        enemy.health.draw(screen)
+
+
+def per_tick(function, ticks, *args):
+    start = time.perf_counter()
+    for _ in range(ticks):
+        function(*args)
+    return (time.perf_counter() - start) / ticks * 1000
+
+
+def bench_swarm(counts=(10, 1000, 10000), ticks=40):
+    screen = pygame.display.get_surface()
+    dt = 1 / 20
+    print(f"{'enemies':<10}{'update, ms':>24}{'draw, ms':>24}")
+    print(f"{'':<10}{'sprites':>12}{'swarm':>12}{'sprites':>12}{'swarm':>12}")
+    for count in counts:
+        rng = random.Random(count)
+        xs = [rng.randrange(width - 96) for _ in range(count)]
+        ys = [rng.randrange(20, height - 96) for _ in range(count)]
+        enemy_group = pygame.sprite.Group()
+        for x, y in zip(xs, ys):
+            # Enemy draws at twice its spawn position
+            Enemy("eyeball.png", x / 2, y / 2, 7, 4, enemy_group)
+        swarm = Swarm("eyeball")
+        swarm.spawn(xs, ys)
+
+        times = (per_tick(update_sprites, ticks, enemy_group, dt), per_tick(swarm.step, ticks, dt),
+                 per_tick(draw_sprites, ticks, enemy_group, screen), per_tick(swarm.draw, ticks, screen))
+        print(f"{count:<10}" + "".join(f"{t:>12.3f}" for t in times))
+
+
+def draw_direct(screen, map, world, font, health_text):
+    screen.fill((0, 0, 0))
+    for surface, pos in map.surfaces():
+        screen.blit(surface, pos)
+    calls = len(map.layers)
+    for group in (world.enemy_group, world.effects, world.player_group):
+        for sprite in group:
+            screen.blit(sprite.image, sprite.rect)
+            calls += 1
+    world.player.health.draw(screen)
+    calls += 1
+    for enemy in world.enemy_group:
+        if enemy.health:
+            enemy.health.draw(screen)
+            calls += 1
+    screen.blit(font.render(world.text, 0, "white"), (32, 48))
+    screen.blit(font.render(str(world.kills), 0, "white"), (550, 370))
+    screen.blit(health_text, (400, 50))
+    return calls + 3
+
+
+def draw_queued(screen, map, world, font, health_text, queue, text_cache):
+    screen.fill((0, 0, 0))
+    hud = [(text_cache.render(font, world.text, "white"), (32, 48)),
+           (text_cache.render(font, str(world.kills), "white"), (550, 370)),
+           (health_text, (400, 50))]
+    queue_frame(queue, map, world, hud)
+    queue.flush(screen)
+
+
+def bench_render(frames=300):
+    screen = pygame.display.get_surface()
+    map = LevelManager(tile_size, preload=False).current.map
+    world = World(width, height, tile_size, "eyeball", map=map)
+    font = pygame.font.Font("data/dungeon_font/ThaleahFat.ttf", 60)
+    health_text = pygame.font.Font("data/dungeon_font/ThaleahFat.ttf", 30).render("health:", True, "white")
+    queue, text_cache = RenderQueue(), TextCache()
+
+    calls = 0
+    start = time.perf_counter()
+    for _ in range(frames):
+        world.step()
+        calls += draw_direct(screen, map, world, font, health_text)
+    before = (time.perf_counter() - start) / frames * 1000
+    before_calls = calls / frames
+
+    world.new_game()
+    start = time.perf_counter()
+    for _ in range(frames):
+        world.step()
+        draw_queued(screen, map, world, font, health_text, queue, text_cache)
+    after = (time.perf_counter() - start) / frames * 1000
+    print(f"{'':<10}{'blit calls':>12}{'items':>8}{'frame, ms':>11}")
+    print(f"{'direct':<10}{before_calls:>12.1f}{before_calls:>8.1f}{before:>11.3f}")
+    print(f"{'queued':<10}{queue.calls / frames:>12.1f}{queue.items / frames:>8.1f}{after:>11.3f}")
+    print(f"text cache: {text_cache.hits} hits, {text_cache.misses} misses")
+
+
+ARMOUR = ("BODY_male.png", "FEET_plate_armor_shoes.png", "LEGS_plate_armor_pants.png", "TORSO_plate_armor_torso.png",
+          "TORSO_plate_armor_arms_shoulders.png", "HANDS_plate_armor_gloves.png", "HEAD_plate_armor_helmet.png",
+          "WEAPON.png")
+
+
+def bench_character(counts=(1, 20, 200), frames=100):
+    screen = pygame.display.get_surface()
+    cache = CharacterCache(tempfile.mkdtemp())
+    start = time.perf_counter()
+    baked, _ = cache.get(ARMOUR, "walkcycle")
+    bake = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    cache.get(ARMOUR, "walkcycle")
+    hit = (time.perf_counter() - start) * 1000
+    cache.clear()
+    start = time.perf_counter()
+    cache.get(ARMOUR, "walkcycle")
+    disk = (time.perf_counter() - start) * 1000
+    print(f"bake {bake:.2f} ms, from disk {disk:.2f} ms, from memory {hit:.4f} ms ({len(ARMOUR)} layers)")
+
+    layers = [load_frames(f"png/walkcycle/{layer}", 9, 4)[0] for layer in ARMOUR]
+    print(f"{'characters':<12}{'per layer, ms':>15}{'baked, ms':>11}{'speedup':>10}")
+    for count in counts:
+        rng = random.Random(count)
+        positions = [(rng.randrange(width - 96), rng.randrange(height - 96)) for _ in range(count)]
+
+        def draw_layers(frame):
+            screen.blits([(frames[frame], pos) for pos in positions for frames in layers], doreturn=False)
+
+        def draw_baked(frame):
+            screen.blits([(baked[frame], pos) for pos in positions], doreturn=False)
+
+        times = [per_tick(lambda: draw(rng.randrange(len(baked))), frames) for draw in (draw_layers, draw_baked)]
+        print(f"{count:<12}{times[0]:>15.3f}{times[1]:>11.3f}{times[0] / times[1]:>9.1f}x")
+
+
+def tiled_map(source, side):
+    # repeats the source map's layers to side x side tiles and saves it next to it
+    tree = ET.parse(os.path.join("data", "maps", source))
+    root = tree.getroot()
+    for layer in root.iter("layer"):
+        data = layer.find("data")
+        rows = [row.rstrip(",").split(",") for row in data.text.split()]
+        tiled = [",".join(rows[y % len(rows)][x % len(rows[0])] for x in range(side)) for y in range(side)]
+        data.text = "\n" + ",\n".join(tiled) + "\n"
+        layer.set("width", str(side))
+        layer.set("height", str(side))
+    root.set("width", str(side))
+    root.set("height", str(side))
+    filename = f"_bench_{side}.tmx"
+    tree.write(os.path.join("data", "maps", filename), encoding="UTF-8", xml_declaration=True)
+    return filename
+
+
+def bench_camera(sides=(40, 250, 1000), frames=300):
+    screen = pygame.display.get_surface()
+    print(f"{'map, tiles':<12}{'load, s':>9}{'frame, ms':>11}{'max frame, ms':>15}{'chunks':>8}{'bakes':>7}")
+    for side in sides:
+        filename = "map2.tmx" if side == 40 else tiled_map("map2.tmx", side)
+        start = time.perf_counter()
+        try:
+            map = Map(filename, tile_size)
+        finally:
+            if filename != "map2.tmx":
+                os.remove(os.path.join("data", "maps", filename))
+        map.bake()
+        load = time.perf_counter() - start
+        camera = Camera(width, height)
+        # walk diagonally across the map, 10px a frame like the player
+        target = pygame.Rect(0, 0, 32, 32)
+        times = []
+        for i in range(frames):
+            target.center = (i * 10 % (side * tile_size), i * 10 % (side * tile_size))
+            camera.follow(target, map)
+            start = time.perf_counter()
+            screen.fill((0, 0, 0))
+            screen.blits(camera.map_surfaces(map), doreturn=False)
+            times.append((time.perf_counter() - start) * 1000)
+        print(f"{side:<12}{load:>9.2f}{sum(times) / frames:>11.3f}{max(times):>15.3f}"
+              f"{len(map.chunks):>8}{map.chunk_bakes:>7}")
+
+
+def draw_scene(target, map, world, hud, queue):
+    world.step(('left', 'up', 'right', 'down')[world.ticks // 10 % 4])
+    target.fill((0, 0, 0))
+    queue_frame(queue, map, world, hud)
+    queue.flush(target)
+
+
+def bench_texture(windows=((640, 480), (1280, 960), (1920, 1440)), frames=200):
+    # the game is drawn at 640x480 and shown in a larger window: the display surface path
+    # scales the finished frame on the CPU, the texture path scales every copy in the renderer.
+    # accelerated=0 forces SDL's software renderer, as on a machine without a GPU
+    map = LevelManager(tile_size, preload=False).current.map
+    world = World(width, height, tile_size, "eyeball", map=map)
+    font = pygame.font.Font("data/dungeon_font/ThaleahFat.ttf", 60)
+    hud = [(font.render(" 20", False, "white"), (32, 48)), (font.render("0", False, "white"), (550, 370))]
+    queue = RenderQueue()
+    frame = pygame.Surface(size).convert()
+    print(f"{'window':<12}{'surface, ms':>13}{'texture, ms':>13}{'uploads':>9}")
+    for window in windows:
+        display = pygame.display.set_mode(window)
+        world.new_game(seed=1)
+        start = time.perf_counter()
+        for _ in range(frames):
+            draw_scene(frame, map, world, hud, queue)
+            if window == size:
+                display.blit(frame, (0, 0))
+            else:
+                pygame.transform.scale(frame, window, display)
+            pygame.display.flip()
+        surface = (time.perf_counter() - start) / frames * 1000
+
+        renderer = TextureRenderer(size, window, accelerated=0)
+        world.new_game(seed=1)
+        draw_scene(renderer, map, world, hud, queue)
+        renderer.present()
+        start = time.perf_counter()
+        for _ in range(frames):
+            draw_scene(renderer, map, world, hud, queue)
+            renderer.present()
+        texture = (time.perf_counter() - start) / frames * 1000
+        print(f"{f'{window[0]}x{window[1]}':<12}{surface:>13.3f}"
+              f"{texture:>13.3f}{renderer.textures.uploads:>9}")
+        del renderer
+    pygame.display.set_mode(size)
+
+
+def bfs_path(map, start, goal):
+    # what every enemy would run on its own without a shared field
+    queue, came = [start], {start: None}
+    for x, y in queue:
+        if (x, y) == goal:
+            break
+        for nx, ny in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)):
+            if (nx, ny) not in came and not map.is_wall(nx, ny):
+                came[(nx, ny)] = (x, y)
+                queue.append((nx, ny))
+    return came
+
+
+def bench_flow(sides=(40, 250, 1000), counts=(100, 1000, 10000), ticks=20):
+    print(f"{'map, tiles':<12}{'field, ms':>11}")
+    for side in sides:
+        filename = "map2.tmx" if side == 40 else tiled_map("map2.tmx", side)
+        try:
+            map = Map(filename, tile_size)
+        finally:
+            if filename != "map2.tmx":
+                os.remove(os.path.join("data", "maps", filename))
+        field = FlowField(map)
+        start = time.perf_counter()
+        for i in range(ticks):
+            field.compute((side // 2 + i % 2, side // 2))
+        print(f"{side:<12}{(time.perf_counter() - start) / ticks * 1000:>11.3f}")
+
+    map = LevelManager(tile_size, preload=False).current.map
+    field = FlowField(map)
+    goal = (map.width // 2, map.height // 2)
+    field.compute(goal)
+    print(f"{'enemies':<10}{'bfs each, ms':>14}{'field sprites, ms':>19}{'field swarm, ms':>17}")
+    for count in counts:
+        rng = random.Random(count)
+        xs = [rng.randrange(width - 96) for _ in range(count)]
+        ys = [rng.randrange(height - 96) for _ in range(count)]
+        enemy_group = pygame.sprite.Group()
+        for x, y in zip(xs, ys):
+            Enemy("eyeball.png", x / 2, y / 2, 7, 4, enemy_group)
+        swarm = Swarm("eyeball")
+        swarm.spawn(xs, ys)
+        tiles = [field.tile(enemy.hitbox.center) for enemy in enemy_group]
+
+        def search_each():
+            for tile in tiles[:100]:
+                bfs_path(map, tile, goal)
+
+        def chase_sprites():
+            for enemy in enemy_group:
+                enemy.chase(field, 4)
+
+        # per-enemy searches are timed on the first 100 enemies and scaled up
+        each = per_tick(search_each, 2) * len(tiles) / min(len(tiles), 100)
+        print(f"{count:<10}{each:>14.1f}{per_tick(chase_sprites, ticks):>19.3f}"
+              f"{per_tick(swarm.chase, ticks, field, 4):>17.3f}")
+
+
+benchmarks = {"map": bench_map, "collisions": bench_collisions, "swarm": bench_swarm, "render": bench_render,
+              "character": bench_character, "camera": bench_camera,
+              "flow": bench_flow, "texture": bench_texture}
+
+if __name__ == '__main__':
+    pygame.init()
+    pygame.display.set_mode(size)
+    for name in sys.argv[1:] or list(benchmarks):
+        benchmarks[name]()
+    pygame.quit()
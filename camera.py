@@ -0,0 +1,58 @@
+import pygame
+
+
+class Camera:
+    def __init__(self, width, height, max_chunks=64, prefetch=1, bakes_per_frame=2):
+        self.rect = pygame.Rect(0, 0, width, height)
+        self.max_chunks = max_chunks
+        # chunks this far outside the view are baked ahead of time, a few per frame
+        self.prefetch = prefetch
+        self.bakes_per_frame = bakes_per_frame
+
+    @property
+    def offset(self):
+        return self.rect.topleft
+
+    def follow(self, target, map=None):
+        self.rect.center = target.center
+        if map is not None:
+            bounds = pygame.Rect(0, 0, map.width * map.tile_size, map.height * map.tile_size)
+            # a map smaller than the view stays pinned to the top left corner
+            self.rect.x = max(0, min(self.rect.x, bounds.w - self.rect.w))
+            self.rect.y = max(0, min(self.rect.y, bounds.h - self.rect.h))
+
+    def apply(self, rect):
+        return rect.move(-self.rect.x, -self.rect.y)
+
+    def sprites(self, group):
+        # sprites live in map coordinates: cull to the view and shift to the screen
+        return [(sprite.image, self.apply(sprite.rect)) for sprite in group if self.rect.colliderect(sprite.rect)]
+
+    def visible(self, rect):
+        return self.rect.colliderect(rect)
+
+    def chunk_range(self, map, margin=0):
+        pixels = map.chunk_tiles * map.tile_size
+        columns, rows = map.chunk_count()
+        x0 = max(self.rect.left // pixels - margin, 0)
+        y0 = max(self.rect.top // pixels - margin, 0)
+        x1 = min((self.rect.right - 1) // pixels + margin, columns - 1)
+        y1 = min((self.rect.bottom - 1) // pixels + margin, rows - 1)
+        return [(cx, cy) for cy in range(y0, y1 + 1) for cx in range(x0, x1 + 1)]
+
+    def map_surfaces(self, map):
+        if map.fits_bake():
+            # small maps keep their whole baked layers; the blit clips them to the screen
+            return [(surface, (-self.rect.x, -self.rect.y)) for surface, _ in map.surfaces()]
+        pixels = map.chunk_tiles * map.tile_size
+        visible = self.chunk_range(map)
+        sequence = [(map.chunk(cx, cy), (cx * pixels - self.rect.x, cy * pixels - self.rect.y))
+                    for cx, cy in visible]
+        self.stream(map, visible)
+        return sequence
+
+    def stream(self, map, visible):
+        ring = [key for key in self.chunk_range(map, self.prefetch) if key not in map.chunks]
+        for cx, cy in ring[:self.bakes_per_frame]:
+            map.chunks[(cx, cy)] = map.bake_chunk(cx, cy)
+        map.evict_chunks(max(self.max_chunks, len(visible)), set(visible))
@@ -0,0 +1,120 @@
+import hashlib
+import os
+import sys
+import threading
+
+import pygame
+from assets import frame_cache, record_sources
+from atlas import get_atlas
+from load_image import load_image
+
+ANIMATIONS = {"walkcycle": (9, 4), "slash": (6, 4), "thrust": (8, 4), "hurt": (6, 1)}
+# LPC layers are stacked back to front in this order
+LAYER_ORDER = ["BEHIND", "BODY", "FEET", "LEGS", "TORSO", "BELT", "HEAD", "HANDS", "WEAPON"]
+EQUIPMENT = ("BODY_skeleton.png", "WEAPON.png")
+
+
+def layer_rank(layer):
+    prefix = layer.split("_")[0].split(".")[0]
+    return LAYER_ORDER.index(prefix) if prefix in LAYER_ORDER else len(LAYER_ORDER)
+
+
+def ordered(layers):
+    return sorted(dict.fromkeys(layers), key=lambda layer: (layer_rank(layer), layer))
+
+
+def combination_key(layers):
+    return hashlib.sha1("|".join(ordered(layers)).encode("utf-8")).hexdigest()[:16]
+
+
+def character_name(layers, animation):
+    # the name a composited sheet is packed under in the atlas
+    return f"characters/{combination_key(layers)}_{animation}.png"
+
+
+class CharacterCache:
+    def __init__(self, directory=None):
+        # with a directory, composited sheets are also kept on disk between runs
+        self.directory = directory
+        self.entries = {}
+        self.hits = 0
+        self.bakes = 0
+        self.disk_hits = 0
+        # loader workers bake and read sheets too; the counters are only changed under the lock
+        self.lock = threading.Lock()
+
+    def get(self, layers, animation, scale=1.5):
+        key = (combination_key(layers), animation, scale)
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            return entry
+        return self.put(layers, animation, scale, self.build(layers, animation, scale))
+
+    def build(self, layers, animation, scale=1.5):
+        # builds frames without touching the cache, so loader threads can call it
+        columns, rows = ANIMATIONS[animation]
+        atlas = get_atlas()
+        if atlas:
+            packed = atlas.get(character_name(layers, animation), columns, rows, scale,
+                               self.sources(layers, animation))
+            if packed is not None:
+                return packed + (None,)
+        sheet = self.load_sheet(layers, animation)
+        return frame_cache.cut_sheet(sheet, columns, rows, scale) + (sheet,)
+
+    def put(self, layers, animation, scale, entry):
+        frames, size, sheet = entry
+        key = (combination_key(layers), animation, scale)
+        if key not in self.entries:
+            if sheet is not None:
+                record_sources(frames, size, sheet)
+            self.entries[key] = (frames, size)
+        return self.entries[key]
+
+    def sources(self, layers, animation):
+        # not every layer exists for every animation (no WEAPON in hurt, for one)
+        names = [f"png/{animation}/{layer}" for layer in ordered(layers)]
+        return [name for name in names if os.path.isfile(os.path.join("data", name))]
+
+    def load_sheet(self, layers, animation):
+        sources = self.sources(layers, animation)
+        if not sources:
+            print(f"Нет ни одного слоя персонажа для анимации '{animation}'")
+            sys.exit()
+        path = None
+        if self.directory:
+            path = os.path.join(self.directory, f"{combination_key(layers)}_{animation}.png")
+            if os.path.isfile(path) and all(os.path.getmtime(path) >= os.path.getmtime(os.path.join("data", name))
+                                            for name in sources):
+                with self.lock:
+                    self.disk_hits += 1
+                return pygame.image.load(path)
+        sheet = self.bake(sources)
+        if path:
+            os.makedirs(self.directory, exist_ok=True)
+            pygame.image.save(sheet, path)
+        return sheet
+
+    def bake(self, sources):
+        with self.lock:
+            self.bakes += 1
+        images = [load_image(name) for name in sources]
+        sheet = pygame.Surface(images[0].get_size(), pygame.SRCALPHA)
+        for image in images:
+            sheet.blit(image, (0, 0))
+        return sheet
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        return {"entries": len(self.entries), "hits": self.hits, "bakes": self.bakes,
+                "disk_hits": self.disk_hits}
+
+
+character_cache = CharacterCache()
+
+
+def load_character(layers, animation, scale=1.5):
+    return character_cache.get(layers, animation, scale)
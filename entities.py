@@ -0,0 +1,288 @@
+import pygame
+import os
+import sys
+import random
+from assets import load_frames
+from character import load_character
+
+
+class Player(pygame.sprite.Sprite):
+    def __init__(self, sheet, x, y, *groups, scale=1.5):
+        super().__init__(*groups)
+        self.x = x
+        self.y = y
+        self.frames = []
+        # a single sheet name, or a set of LPC layers composited into one sprite
+        if isinstance(sheet, str):
+            self.cut_sheet(f"png/walkcycle/{sheet}", 9, 4, scale)
+            self.cut_sheet(f"png/slash/{sheet}", 6, 4, scale)
+        else:
+            self.add_frames(*load_character(sheet, "walkcycle", scale))
+            self.add_frames(*load_character(sheet, "slash", scale))
+        self.cur_frame = 0
+        self.image = self.frames[self.cur_frame]
+        self.rect = self.rect.move(x, y)
+        self.direction = 'up'
+        self.up = self.frames[0:9]
+        self.left = self.frames[9:18]
+        self.down = self.frames[18:27]
+        self.right = self.frames[27:36]
+
+        self.sup = self.frames[36:42]
+        self.sleft = self.frames[42:48]
+        self.sdown = self.frames[48:54]
+        self.sright = self.frames[54:60]
+        self.slashing = False
+        self.slash_frame = 0
+        self.slash_duration = 9
+        self.reach = 24
+        self.body = self.image.get_bounding_rect()
+
+        self.health = Health(400, 80, 200, 20, 10)
+
+    def reset(self, x, y):
+        # a new round reuses the player instead of cutting its frames again
+        self.x = x
+        self.y = y
+        self.cur_frame = 0
+        self.image = self.frames[self.cur_frame]
+        self.rect.topleft = (x, y)
+        self.direction = 'up'
+        self.slashing = False
+        self.slash_frame = 0
+        self.health.reset(self.health.x, self.health.y, self.health.max_hp)
+
+    def load_image(self, name, colorkey=None):
+        fullname = os.path.join('data', name)
+        if not os.path.isfile(fullname):
+            print(f"Файл с изображением '{fullname}' не найден")
+            sys.exit()
+        image = pygame.image.load(fullname)
+        return image
+
+    def cut_sheet(self, name, columns, rows, scale):
+        self.add_frames(*load_frames(name, columns, rows, scale))
+
+    def add_frames(self, frames, size):
+        self.rect = pygame.Rect((0, 0), size)
+        self.frames.extend(frames)
+
+    def move(self, x, y):
+        self.x += x
+        self.y += y
+
+    @property
+    def hitbox(self):
+        return self.body.move(self.x, self.y)
+
+    @property
+    def feet(self):
+        hitbox = self.hitbox
+        return pygame.Rect(hitbox.x, hitbox.bottom - 16, hitbox.w, 16)
+
+    def slash_area(self):
+        area = self.hitbox
+        if self.direction == 'up':
+            area.top -= self.reach
+        elif self.direction == 'down':
+            area.bottom += self.reach
+        elif self.direction == 'left':
+            area.left -= self.reach
+        elif self.direction == 'right':
+            area.right += self.reach
+        return area.union(self.hitbox)
+
+    def slash(self, kills, grid, effects):
+        try:
+            if not self.slashing:
+                self.slashing = True
+                self.slash_frame = 0
+            slashed_enemy = grid.first(self.slash_area())
+            if slashed_enemy:
+                slashed_enemy.health.hp -= 1
+                if slashed_enemy.health.hp == 0:
+                    slashed_enemy.explode(effects)
+                    grid.remove(slashed_enemy)
+                    kills += 1
+
+
+        except AttributeError:
+            pass
+
+        finally:
+            return kills
+
+    def update(self, dest):
+        self.rect.x = self.x
+        self.rect.y = self.y
+
+        if self.slashing:
+            if self.direction == 'up':
+                self.image = self.sup[self.slash_frame]
+            elif self.direction == 'down':
+                self.image = self.sdown[self.slash_frame]
+            elif self.direction == 'left':
+                self.image = self.sleft[self.slash_frame]
+            elif self.direction == 'right':
+                self.image = self.sright[self.slash_frame]
+
+            self.slash_frame += 1
+            if self.slash_frame >= len(self.sup):
+                self.slashing = False
+                self.slash_frame = 0
+        else:
+            if dest == 'up':
+                self.direction = 'up'
+                self.cur_frame = (self.cur_frame + 1) % len(self.up)
+                self.image = self.up[self.cur_frame]
+            elif dest == 'left':
+                self.direction = 'left'
+                self.cur_frame = (self.cur_frame + 1) % len(self.left)
+                self.image = self.left[self.cur_frame]
+            elif dest == 'down':
+                self.direction = 'down'
+                self.cur_frame = (self.cur_frame + 1) % len(self.down)
+                self.image = self.down[self.cur_frame]
+            elif dest == 'right':
+                self.direction = 'right'
+                self.cur_frame = (self.cur_frame + 1) % len(self.right)
+                self.image = self.right[self.cur_frame]
+
+
+class Enemy(pygame.sprite.Sprite):
+    def __init__(self, sheet, x, y, columns, rows, *groups, scale=1.5, max_hp=3, rng=random):
+        super().__init__(*groups)
+        self.x = x
+        self.y = y
+        self.sheet = sheet
+        self.frames = []
+        self.cut_sheet(f"enemies/{sheet}", columns, rows, scale)
+        self.size = self.rect.size
+        self.frame_groups = [self.frames[columns * row:columns * (row + 1)] for row in range(4)]
+        self.health = Health(0, 0, 50, 10, max_hp)
+        self.reset(x, y, max_hp=max_hp, rng=rng)
+
+    def reset(self, x, y, *groups, max_hp=3, rng=random):
+        # puts a pooled enemy back to its freshly spawned state
+        self.add(*groups)
+        self.x = x
+        self.y = y
+        self.frames = self.frame_groups[rng.randint(0, 3)]
+        rect = pygame.Rect((x, y), self.size)
+        self.health.reset(rect.x + 22, rect.y - 20, max_hp)
+        self.cur_frame = 0
+        self.image = self.frames[self.cur_frame]
+        self.rect = rect.move(x, y)
+        self.body = self.image.get_bounding_rect()
+
+        self.animation_speed = 0.2
+        self.frame_time = 0
+
+    def load_image(self, name, colorkey=None):
+        fullname = os.path.join('data', name)
+        if not os.path.isfile(fullname):
+            print(f"Файл с изображением '{fullname}' не найден")
+            sys.exit()
+        image = pygame.image.load(fullname)
+        return image
+
+    def cut_sheet(self, name, columns, rows, scale):
+        frames, size = load_frames(name, columns, rows, scale)
+        self.rect = pygame.Rect((self.x, self.y), size)
+        self.frames.extend(frames)
+
+    @property
+    def hitbox(self):
+        return self.body.move(self.rect.topleft)
+
+    def update(self, dt, player=None):
+        self.frame_time += dt
+        if self.frame_time >= self.animation_speed:
+            self.cur_frame = (self.cur_frame + 1) % len(self.frames)
+            self.image = self.frames[self.cur_frame]
+            if self.image == self.frames[4]:
+                if player and player.health.hp > 0:
+                    player.health.hp -= 1
+                    if player.health.hp == 0:
+                        return True
+            self.frame_time = 0
+            self.place_health()
+
+        return False
+
+    def place_health(self):
+        if self.sheet == 'bee.png':
+            self.health.update_position(self.rect.x, self.rect.y - 20)
+        else:
+            self.health.update_position(self.rect.x + 22, self.rect.y - 20)
+
+    def chase(self, field, speed):
+        # steps towards the centre of the next tile of the flow field
+        center = self.hitbox.center
+        target = field.next_center(center)
+        if target is None:
+            return False
+        self.rect.move_ip(max(-speed, min(speed, target[0] - center[0])),
+                          max(-speed, min(speed, target[1] - center[1])))
+        self.place_health()
+        return True
+
+    def explode(self, effects):
+        # the enemy leaves the round at once; the explosion plays as a pooled effect
+        # the rect follows the enemy when it chases, self.x and self.y stay at the spawn point
+        effects.spawn(self.rect.x - 30, self.rect.y - 20)
+        self.kill()
+
+
+gradients = {}
+
+
+def gradient(w, h):
+    strip = gradients.get((w, h))
+    if strip is None:
+        strip = pygame.Surface((w, h))
+        for i in range(w):
+            color = (int(255 * (1 - i / w)), int(255 * (i / w)), 0)
+            pygame.draw.line(strip, color, (i, 0), (i, h - 1))
+        gradients[(w, h)] = strip
+    return strip
+
+
+class Health:
+    __slots__ = ("x", "y", "w", "h", "hp", "max_hp", "image", "drawn")
+
+    def __init__(self, x, y, w, h, max_hp):
+        self.x = x
+        self.y = y
+        self.w = w
+        self.h = h
+        self.hp = max_hp
+        self.max_hp = max_hp
+        self.image = None
+        self.drawn = None
+
+    def reset(self, x, y, max_hp):
+        self.x = x
+        self.y = y
+        self.hp = max_hp
+        self.max_hp = max_hp
+
+    def update_position(self, x, y):
+        self.x = x
+        self.y = y
+
+    def render(self):
+        ratio = max(self.hp, 0) / self.max_hp
+        self.image = pygame.Surface((self.w, self.h), pygame.SRCALPHA)
+        pygame.draw.rect(self.image, "white", (0, 0, self.w, self.h), border_radius=5)
+        self.image.blit(gradient(self.w, self.h), (0, 0), (0, 0, int(self.w * ratio), self.h))
+        pygame.draw.rect(self.image, "white", (0, 0, self.w, self.h), 2, border_radius=5)
+        self.drawn = (self.hp, self.max_hp)
+
+    def get_image(self):
+        if self.drawn != (self.hp, self.max_hp):
+            self.render()
+        return self.image
+
+    def draw(self, surface):
+        surface.blit(self.get_image(), (self.x, self.y))
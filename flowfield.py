@@ -0,0 +1,85 @@
+import numpy as np
+
+# no step, left, right, up, down
+STEP_X = np.array([0, -1, 1, 0, 0], dtype=np.int8)
+STEP_Y = np.array([0, 0, 0, -1, 1], dtype=np.int8)
+MOVES = list(zip(STEP_X.tolist(), STEP_Y.tolist()))
+UNREACHABLE = np.iinfo(np.int32).max
+
+
+class FlowField:
+    def __init__(self, map):
+        self.map = map
+        self.width = map.width
+        self.height = map.height
+        self.tile_size = map.tile_size
+        self.target = None
+        self.walls_seen = None
+        self.recomputes = 0
+        self.distance = np.full((self.height, self.width), -1, dtype=np.int32)
+        self.dx = np.zeros((self.height, self.width), dtype=np.int8)
+        self.dy = np.zeros((self.height, self.width), dtype=np.int8)
+        self.codes = [0] * (self.width * self.height)
+
+    def tile(self, pos):
+        return int(pos[0]) // self.tile_size, int(pos[1]) // self.tile_size
+
+    def update(self, pos):
+        # the field only changes when the target moves to another tile or a wall changes
+        tile = self.tile(pos)
+        if tile == self.target and self.walls_seen == self.map.wall_changes:
+            return False
+        self.compute(tile)
+        return True
+
+    def compute(self, tile):
+        self.target = tile
+        self.walls_seen = self.map.wall_changes
+        self.recomputes += 1
+        width, height = self.width, self.height
+        open_tiles = np.frombuffer(self.map.walls, dtype=np.uint8) == 0
+        distance = np.full(width * height, -1, dtype=np.int32)
+        x, y = tile
+        if 0 <= x < width and 0 <= y < height:
+            # breadth-first search, one whole wavefront of tile indices per iteration
+            frontier = np.array([y * width + x])
+            distance[frontier] = 0
+            step = 0
+            while frontier.size:
+                step += 1
+                column = frontier % width
+                # each shift of the frontier has no duplicates, and filtering the shifts one
+                # after another drops tiles already reached, so no np.unique is needed
+                reached = []
+                for neighbours in (frontier[column > 0] - 1, frontier[column < width - 1] + 1,
+                                   frontier[frontier >= width] - width,
+                                   frontier[frontier < width * (height - 1)] + width):
+                    neighbours = neighbours[open_tiles[neighbours] & (distance[neighbours] < 0)]
+                    distance[neighbours] = step
+                    reached.append(neighbours)
+                frontier = np.concatenate(reached)
+        self.distance = distance.reshape(height, width)
+
+        # every tile points at its neighbour closest to the target
+        cost = np.where(self.distance < 0, UNREACHABLE, self.distance)
+        padded = np.pad(cost, 1, constant_values=UNREACHABLE)
+        neighbours = np.stack([padded[1:-1, :-2], padded[1:-1, 2:], padded[:-2, 1:-1], padded[2:, 1:-1]])
+        best = neighbours.argmin(axis=0)
+        codes = np.where(np.take_along_axis(neighbours, best[None], 0)[0] < cost, best + 1, 0).astype(np.int8)
+        self.dx = STEP_X[codes]
+        self.dy = STEP_Y[codes]
+        self.codes = codes.ravel().tolist()
+
+    def step(self, x, y):
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return MOVES[self.codes[y * self.width + x]]
+        return 0, 0
+
+    def next_center(self, pos):
+        # pixel centre of the next tile on the way to the target, or None when there is none
+        x, y = self.tile(pos)
+        dx, dy = self.step(x, y)
+        if not (dx or dy):
+            return None
+        return ((x + dx) * self.tile_size + self.tile_size // 2,
+                (y + dy) * self.tile_size + self.tile_size // 2)
@@ -0,0 +1,96 @@
+import os
+import random
+import sys
+import time
+
+import pygame
+from levels import LevelManager
+from world import World, ENEMIES
+
+size = width, height = 640, 480
+tile_size = 16
+directions = [None, 'left', 'right', 'up', 'down']
+
+
+def init():
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.init()
+    # frames are converted to the display format, so a (tiny) display must exist
+    if pygame.display.get_surface() is None:
+        pygame.display.set_mode((1, 1))
+
+
+class RandomBot:
+    def __init__(self, seed=None, slash_chance=0.3, turn_chance=0.2):
+        self.rng = random.Random(seed)
+        self.slash_chance = slash_chance
+        self.turn_chance = turn_chance
+        self.direction = None
+
+    def __call__(self, world):
+        if self.rng.random() < self.turn_chance:
+            self.direction = self.rng.choice(directions)
+        return self.direction, self.rng.random() < self.slash_chance
+
+
+class ChaseBot:
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
+
+    def __call__(self, world):
+        # walks to the nearest enemy and slashes once one is in reach
+        player = world.player
+        if world.grid.first(player.slash_area()):
+            return None, True
+        hitbox = player.hitbox
+        target = min(world.grid.items, default=None,
+                     key=lambda enemy: abs(enemy.hitbox.centerx - hitbox.centerx)
+                     + abs(enemy.hitbox.centery - hitbox.centery))
+        if target is None:
+            return None, False
+        dx, dy = target.hitbox.centerx - hitbox.centerx, target.hitbox.centery - hitbox.centery
+        horizontal = 'left' if dx < 0 else 'right'
+        vertical = 'up' if dy < 0 else 'down'
+        options = [horizontal, vertical] if abs(dx) > abs(dy) else [vertical, horizontal]
+        for direction in options:
+            if world.can_move(*world.offsets[direction]):
+                return direction, False
+        return self.rng.choice(directions), False
+
+
+bots = {"random": RandomBot, "chase": ChaseBot}
+
+
+def run_round(world, bot, max_ticks=100000, seed=None):
+    world.new_game(seed)
+    while not world.stop and world.ticks < max_ticks:
+        world.step(*bot(world))
+    return world
+
+
+def run(rounds, enemy_type='eyeball', level=0, seed=None):
+    levels = LevelManager(tile_size, preload=False)
+    levels.index = level
+    world = World(width, height, tile_size, enemy_type, levels.current.enemy_hp, map=levels.current.map, seed=seed)
+    bot = RandomBot(seed)
+    results = []
+    for _ in range(rounds):
+        run_round(world, bot)
+        results.append((world.result, world.kills, world.ticks, world.player.health.hp))
+    return results
+
+
+if __name__ == '__main__':
+    init()
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    enemy_type = sys.argv[2] if len(sys.argv) > 2 else 'eyeball'
+    if enemy_type not in ENEMIES:
+        print(f"Неизвестный тип врага '{enemy_type}'")
+        sys.exit()
+    start = time.perf_counter()
+    results = run(rounds, enemy_type)
+    elapsed = time.perf_counter() - start
+    ticks = sum(r[2] for r in results)
+    victories = sum(1 for r in results if r[0] == 'victory')
+    print(f"{rounds} rounds, {ticks} ticks in {elapsed:.2f}s: "
+          f"{rounds / elapsed:.0f} rounds/s, {ticks / elapsed:.0f} ticks/s, {victories} victories")
@@ -0,0 +1,54 @@
+from loader import Loader
+from tilemap import Map
+
+LEVELS = [("map1.tmx", 3), ("map2.tmx", 5), ("map3.tmx", 10)]
+
+
+class Level:
+    def __init__(self, filename, enemy_hp, tile_size):
+        self.filename = filename
+        self.enemy_hp = enemy_hp
+        self.map = Map(filename, tile_size)
+        self.map.bake()
+
+
+class LevelManager:
+    def __init__(self, tile_size, levels=LEVELS, preload=True, loader=None):
+        self.tile_size = tile_size
+        self.levels = levels
+        self.index = 0
+        self.loaded = {}
+        self.preload_next = preload
+        self.loader = loader or (Loader(workers=1) if preload else None)
+        self.get(0)
+        if self.preload_next:
+            self.preload(1)
+
+    def build(self, index):
+        filename, enemy_hp = self.levels[index]
+        return Level(filename, enemy_hp, self.tile_size)
+
+    def load(self, index):
+        self.loaded.setdefault(index, self.build(index))
+
+    def preload(self, index):
+        if self.loader is not None:
+            self.loader.prefetch_level(self, index)
+
+    def get(self, index):
+        if index not in self.loaded and self.loader is not None:
+            self.loader.poll()
+            self.loader.wait(("level", index))
+        if index not in self.loaded:
+            self.load(index)
+        return self.loaded[index]
+
+    @property
+    def current(self):
+        return self.get(self.index)
+
+    def advance(self):
+        self.index = min(self.index + 1, len(self.levels) - 1)
+        if self.preload_next:
+            self.preload(self.index + 1)
+        return self.current
@@ -4,6 +4,12 @@ import sys
 import random
 
 def load_image(name, colorkey=None):
+    from atlas import get_atlas
+    atlas = get_atlas()
+    if atlas:
+        packed = atlas.get(name, 1, 1, 1)
+        if packed is not None:
+            return packed[0][0]
     fullname = os.path.join('data', name)
     if not os.path.isfile(fullname):
         print(f"Файл с изображением '{fullname}' не найден")
@@ -0,0 +1,102 @@
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+from assets import frame_cache
+from character import character_cache, EQUIPMENT
+from world import ENEMIES
+
+EXPLOSION = ("particles/explosion.png", 12, 1, 1.5)
+
+
+class Loader:
+    def __init__(self, workers=2):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="loader")
+        # workers only decode and build; results are handed back to the main thread
+        # through this queue and installed by poll(), so no cache is shared mid-build
+        # (the atlas and the character bake counters, which workers do touch, take a lock)
+        self.results = queue.Queue()
+        self.pending = {}
+        self.ready = {}
+        self.errors = {}
+
+    def submit(self, key, install, build, *args):
+        if key in self.pending or key in self.ready:
+            return
+        self.pending[key] = install
+        self.executor.submit(self.run, key, build, args)
+
+    def run(self, key, build, args):
+        # load_image reports a missing file with sys.exit(): the SystemExit is handed back too,
+        # so wait() raises it on the main thread instead of waiting for a result that never comes
+        try:
+            self.results.put((key, build(*args), None))
+        except BaseException as error:
+            self.results.put((key, None, error))
+
+    def install(self, key, value, error):
+        install = self.pending.pop(key)
+        if error is not None:
+            self.errors[key] = error
+            return
+        if install is not None:
+            install(value)
+        self.ready[key] = value
+
+    def poll(self):
+        # called once per frame: never blocks, installs whatever has finished
+        installed = 0
+        while True:
+            try:
+                key, value, error = self.results.get_nowait()
+            except queue.Empty:
+                return installed
+            self.install(key, value, error)
+            installed += 1
+
+    def wait(self, key):
+        # only for loading screens and round transitions, never mid-round
+        while key in self.pending:
+            self.install(*self.results.get())
+        if key in self.errors:
+            raise self.errors.pop(key)
+        return self.ready.get(key)
+
+    def busy(self):
+        return bool(self.pending)
+
+    def prefetch_frames(self, name, columns, rows, scale=1.5):
+        key = ("frames", name, columns, rows, scale)
+        self.submit(key, lambda entry: frame_cache.put(key[1:], *entry), frame_cache.load,
+                    name, columns, rows, scale)
+        return key
+
+    def prefetch_enemy(self, enemy_type):
+        if enemy_type not in ENEMIES:
+            return []
+        sheet, columns, rows = ENEMIES[enemy_type]
+        return [self.prefetch_frames(f"enemies/{sheet}", columns, rows),
+                self.prefetch_frames(*EXPLOSION)]
+
+    def prefetch_character(self, layers=EQUIPMENT, animations=("walkcycle", "slash"), scale=1.5):
+        keys = []
+        for animation in animations:
+            key = ("character", tuple(layers), animation, scale)
+            self.submit(key, lambda entry, key=key: character_cache.put(key[1], key[2], key[3], entry),
+                        character_cache.build, layers, animation, scale)
+            keys.append(key)
+        return keys
+
+    def prefetch_level(self, levels, index):
+        if index >= len(levels.levels):
+            return None
+        key = ("level", index)
+        if index not in levels.loaded:
+            self.submit(key, lambda level: levels.loaded.setdefault(index, level), levels.build, index)
+        return key
+
+    def wait_all(self, keys):
+        for key in keys:
+            self.wait(key)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
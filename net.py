@@ -0,0 +1,618 @@
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from collections import deque
+
+import pygame
+from assets import load_frames
+from camera import Camera
+from entities import Player, Health
+from headless import RandomBot, init, width, height, tile_size
+from levels import LevelManager, LEVELS
+from render import TextCache
+from replay import write_varint, read_varint, encode_input, decode_input
+from world import World, ENEMIES, FPS, read_direction
+
+HELLO, WELCOME, FULL, INPUT, SNAPSHOT, BYE = range(1, 7)
+# every entity key carries its kind in the low two bits
+GLOBAL, PLAYER, ENEMY, EFFECT = range(4)
+FIELDS = {GLOBAL: 5, PLAYER: 4, ENEMY: 4, EFFECT: 3}
+RESULTS = [None, 'victory', 'game over']
+PORT = 47800
+HISTORY = 64
+REDUNDANCY = 4
+MAX_QUEUE = 3
+TIMEOUT = 5
+
+
+def zigzag(value):
+    return value << 1 if value >= 0 else (-value << 1) - 1
+
+
+def unzigzag(value):
+    return -((value + 1) >> 1) if value & 1 else value >> 1
+
+
+def capture(world, level, round_number):
+    # the snapshot keeps small integers only: positions in whole pixels, images as indices into the frames
+    state = {GLOBAL: (level, round_number, world.counter, world.kills, RESULTS.index(world.result))}
+    for i, player in enumerate(world.players):
+        state[i << 2 | PLAYER] = (round(player.x), round(player.y), player.frames.index(player.image),
+                                  player.health.hp)
+    for i, enemy in enumerate(world.spawned):
+        if enemy.alive():
+            frame = enemy.frame_groups.index(enemy.frames) * len(enemy.frames) + enemy.cur_frame
+            state[i << 2 | ENEMY] = (enemy.rect.x, enemy.rect.y, frame, enemy.health.hp)
+    for i, effect in enumerate(world.effects):
+        state[i << 2 | EFFECT] = (effect.rect.x, effect.rect.y, effect.frame)
+    return state
+
+
+def raw_size(state):
+    # what the same snapshot costs as a plain struct: a tick, then a key and four bytes per field
+    return 4 + sum(2 + 4 * len(values) for values in state.values())
+
+
+def encode_snapshot(tick, base_tick, applied, state, baseline):
+    # only entities that differ from the baseline are written, each with a mask of the
+    # changed fields and the zigzag-coded difference of every changed field
+    out = bytearray([SNAPSHOT])
+    for value in (tick, base_tick, applied):
+        write_varint(out, value)
+    changed = [key for key, values in state.items() if baseline.get(key) != values]
+    write_varint(out, len(changed))
+    for key in changed:
+        values = state[key]
+        base = baseline.get(key) or (0,) * len(values)
+        write_varint(out, key)
+        mask = 0
+        for i in range(len(values)):
+            if values[i] != base[i]:
+                mask |= 1 << i
+        out.append(mask)
+        for i in range(len(values)):
+            if mask & 1 << i:
+                write_varint(out, zigzag(values[i] - base[i]))
+    removed = [key for key in baseline if key not in state]
+    write_varint(out, len(removed))
+    for key in removed:
+        write_varint(out, key)
+    return bytes(out)
+
+
+def decode_snapshot(data, baselines):
+    # returns (tick, applied input, state), or None when the baseline is no longer known
+    tick, offset = read_varint(data, 1)
+    base_tick, offset = read_varint(data, offset)
+    applied, offset = read_varint(data, offset)
+    if base_tick and base_tick not in baselines:
+        return None
+    baseline = baselines[base_tick] if base_tick else {}
+    state = dict(baseline)
+    count, offset = read_varint(data, offset)
+    for _ in range(count):
+        key, offset = read_varint(data, offset)
+        values = list(baseline.get(key) or (0,) * FIELDS[key & 3])
+        mask = data[offset]
+        offset += 1
+        for i in range(len(values)):
+            if mask & 1 << i:
+                delta, offset = read_varint(data, offset)
+                values[i] += unzigzag(delta)
+        state[key] = tuple(values)
+    count, offset = read_varint(data, offset)
+    for _ in range(count):
+        key, offset = read_varint(data, offset)
+        del state[key]
+    return tick, applied, state
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+class Connection:
+    def __init__(self, slot, now):
+        self.slot = slot
+        self.last_seen = now
+        self.inputs = deque()
+        self.last_seq = 0
+        # the last input applied, sent back so the client can replay the ones after it
+        self.applied = 0
+        # the newest snapshot the client has, the baseline of the next delta
+        self.ack = 0
+        self.sent = {}
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.snapshots = 0
+        self.full = 0
+        self.raw_bytes = 0
+        self.starved = 0
+        self.dropped = 0
+
+    def read_input(self, data):
+        seq, offset = read_varint(data, 1)
+        ack, offset = read_varint(data, offset)
+        self.ack = max(self.ack, ack)
+        count = data[offset]
+        # a packet repeats the last few inputs, oldest first, so one lost packet loses nothing
+        for i, code in enumerate(data[offset + 1:offset + 1 + count]):
+            number = seq - count + 1 + i
+            if number > self.last_seq:
+                self.inputs.append((number, code))
+                self.last_seq = number
+
+    def next_input(self):
+        # a queue that grew during a stall is cut back so input latency stays short
+        while len(self.inputs) > MAX_QUEUE:
+            self.inputs.popleft()
+            self.dropped += 1
+        if not self.inputs:
+            self.starved += 1
+            return None, False
+        self.applied, code = self.inputs.popleft()
+        return decode_input(code)
+
+    def snapshot(self, tick, state):
+        baseline = self.sent.get(self.ack)
+        data = encode_snapshot(tick, self.ack if baseline is not None else 0, self.applied, state, baseline or {})
+        self.sent[tick] = state
+        self.sent.pop(tick - HISTORY, None)
+        self.snapshots += 1
+        self.full += baseline is None
+        self.raw_bytes += raw_size(state)
+        self.bytes_out += len(data)
+        return data
+
+
+class Server(asyncio.DatagramProtocol):
+    def __init__(self, world, levels, rate=FPS, restart=2.0, loss=0.0, seed=None):
+        self.world = world
+        self.levels = levels
+        self.rate = rate
+        self.restart_ticks = int(restart * rate)
+        self.loss = loss
+        self.rng = random.Random(seed)
+        self.transport = None
+        self.clients = {}
+        # connections that said goodbye or timed out, kept for the report
+        self.departed = []
+        self.tick = 0
+        self.round = 0
+        self.stopped_ticks = 0
+        self.step_times = []
+        self.send_times = []
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def send(self, data, addr):
+        # --loss drops packets on purpose, to exercise the delta baselines and input redundancy
+        if self.loss and self.rng.random() < self.loss:
+            return
+        self.transport.sendto(data, addr)
+
+    def welcome(self, client):
+        world = self.world
+        meta = {"enemy_type": world.enemy_type, "players": len(world.players), "rate": self.rate,
+                "steps": world.steps, "equipment": list(world.equipment)}
+        return bytes([WELCOME, client.slot]) + json.dumps(meta).encode("utf-8")
+
+    def datagram_received(self, data, addr):
+        client = self.clients.get(addr)
+        if data[0] == HELLO:
+            if client is None:
+                taken = {client.slot for client in self.clients.values()}
+                free = [slot for slot in range(len(self.world.players)) if slot not in taken]
+                if not free:
+                    self.send(bytes([FULL]), addr)
+                    return
+                client = self.clients[addr] = Connection(free[0], time.perf_counter())
+            self.send(self.welcome(client), addr)
+        if client is None:
+            return
+        client.last_seen = time.perf_counter()
+        client.bytes_in += len(data)
+        if data[0] == INPUT:
+            client.read_input(data)
+        elif data[0] == BYE:
+            self.departed.append(self.clients.pop(addr))
+
+    def step(self):
+        start = time.perf_counter()
+        world = self.world
+        for addr, client in list(self.clients.items()):
+            if start - client.last_seen > TIMEOUT:
+                self.departed.append(self.clients.pop(addr))
+        inputs = [(None, False)] * len(world.players)
+        for client in self.clients.values():
+            inputs[client.slot] = client.next_input()
+        if world.stop:
+            # the finished round stays on screen for a moment, then the next one starts
+            self.stopped_ticks += 1
+            if self.stopped_ticks >= self.restart_ticks:
+                if world.result == 'victory':
+                    world.map = self.levels.advance().map
+                world.enemy_hp = self.levels.current.enemy_hp
+                world.new_game()
+                self.round += 1
+                self.stopped_ticks = 0
+        else:
+            world.step(*inputs[0], others=inputs[1:])
+        self.tick += 1
+        state = capture(world, self.levels.index, self.round)
+        stepped = time.perf_counter()
+        for addr, client in self.clients.items():
+            self.send(client.snapshot(self.tick, state), addr)
+        self.step_times.append((stepped - start) * 1000)
+        self.send_times.append((time.perf_counter() - stepped) * 1000)
+
+    async def run(self, seconds=None):
+        loop = asyncio.get_running_loop()
+        interval = 1 / self.rate
+        start = next_tick = loop.time()
+        while seconds is None or loop.time() - start < seconds:
+            self.step()
+            next_tick += interval
+            delay = next_tick - loop.time()
+            if delay < 0:
+                # a slow tick pushes the schedule back instead of running a burst of ticks
+                next_tick = loop.time()
+            await asyncio.sleep(max(delay, 0))
+
+    def report(self):
+        lines = [f"server: {self.tick} ticks at {self.rate} Hz, "
+                 f"step {sum(self.step_times) / max(len(self.step_times), 1):.3f} ms mean "
+                 f"/ {percentile(self.step_times, 0.95):.3f} p95 / {max(self.step_times, default=0):.3f} max, "
+                 f"snapshots {sum(self.send_times) / max(len(self.send_times), 1):.3f} ms mean"]
+        for client in sorted(self.departed + list(self.clients.values()), key=lambda client: client.slot):
+            seconds = client.snapshots / self.rate or 1
+            lines.append(f"  slot {client.slot}: down {client.bytes_out / seconds / 1024:.2f} kB/s "
+                         f"({client.bytes_out / max(client.snapshots, 1):.1f} B/snapshot, {client.full} full, "
+                         f"raw {client.raw_bytes / max(client.bytes_out, 1):.1f}x larger), "
+                         f"up {client.bytes_in / seconds / 1024:.2f} kB/s, "
+                         f"{client.starved} ticks without input, {client.dropped} inputs dropped")
+        return "\n".join(lines)
+
+
+class Client(asyncio.DatagramProtocol):
+    def __init__(self, levels, bot=None, interpolation=2, loss=0.0, seed=None):
+        self.levels = levels
+        self.bot = bot
+        # remote entities are drawn this many ticks in the past, between two received snapshots
+        self.interpolation = interpolation
+        self.loss = loss
+        self.rng = random.Random(seed)
+        self.transport = None
+        self.welcomed = asyncio.Event()
+        self.rejected = False
+        self.slot = None
+        self.meta = None
+        self.player = None
+        self.map = None
+        self.offsets = {}
+        self.snapshots = {}
+        self.received = deque(maxlen=HISTORY)
+        self.latest = 0
+        self.latest_time = 0
+        self.stopped = False
+        self.seq = 0
+        # inputs the server has not applied yet, with the position predicted after each
+        self.pending = deque()
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.late = 0
+        self.no_baseline = 0
+        self.mispredicted = 0
+        self.predicted = 0
+        self.frames = 0
+        self.extrapolated = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def send(self, data):
+        if self.loss and self.rng.random() < self.loss:
+            return
+        self.bytes_out += len(data)
+        self.transport.sendto(data)
+
+    def datagram_received(self, data, addr):
+        self.bytes_in += len(data)
+        if data[0] == WELCOME and self.slot is None:
+            self.slot = data[1]
+            self.meta = json.loads(data[2:])
+            steps = self.meta["steps"]
+            self.offsets = {'left': (-steps, 0), 'right': (steps, 0), 'up': (0, -steps), 'down': (0, steps)}
+            # the client's own player is only used for its frames and for predicting its moves
+            self.player = Player(tuple(self.meta["equipment"]), 0, 0)
+            self.welcomed.set()
+        elif data[0] == FULL:
+            self.rejected = True
+            self.welcomed.set()
+        elif data[0] == SNAPSHOT and self.slot is not None:
+            decoded = decode_snapshot(data, self.snapshots)
+            if decoded is None:
+                self.no_baseline += 1
+                return
+            tick, applied, state = decoded
+            if tick <= self.latest:
+                self.late += 1
+                return
+            # ticks lost on the way never arrive to push their predecessors out: the snapshots
+            # kept are exactly the ticks in received, the oldest goes when it is full
+            if len(self.received) == self.received.maxlen:
+                self.snapshots.pop(self.received[0], None)
+            self.snapshots[tick] = state
+            self.received.append(tick)
+            self.latest = tick
+            self.latest_time = time.perf_counter()
+            level, _, _, _, result = state[GLOBAL]
+            if self.map is None or level != self.levels.index:
+                self.levels.index = level
+                self.map = self.levels.current.map
+            self.stopped = result != 0
+            self.reconcile(state, applied)
+
+    def predict(self, code):
+        # the same movement rule as World.step: a move happens only if the feet stay walkable
+        direction, _ = decode_input(code)
+        dx, dy = self.offsets.get(direction, (0, 0))
+        if (dx or dy) and not self.stopped and self.map.walkable_rect(self.player.feet.move(dx, dy)):
+            self.player.move(dx, dy)
+        return self.player.x, self.player.y
+
+    def reconcile(self, state, applied):
+        own = state.get(self.slot << 2 | PLAYER)
+        if own is None:
+            return
+        while self.pending and self.pending[0][0] < applied:
+            self.pending.popleft()
+        if self.pending and self.pending[0][0] == applied:
+            _, _, position = self.pending.popleft()
+            self.predicted += 1
+            self.mispredicted += position != own[:2]
+        # start again from the server's position and replay what it has not seen yet
+        self.player.x, self.player.y = own[:2]
+        self.pending = deque((seq, code, self.predict(code)) for seq, code, _ in self.pending)
+
+    def send_input(self, direction, slash):
+        self.seq += 1
+        code = encode_input(direction, slash)
+        self.pending.append((self.seq, code, self.predict(code)))
+        recent = [code for _, code, _ in list(self.pending)[-REDUNDANCY:]]
+        out = bytearray([INPUT])
+        write_varint(out, self.seq)
+        write_varint(out, self.latest)
+        out.append(len(recent))
+        out += bytes(recent)
+        self.send(out)
+
+    def view(self, now):
+        # the state to draw: remote entities interpolated in the past, the own player predicted
+        self.frames += 1
+        render_tick = self.latest + (now - self.latest_time) * self.meta["rate"] - self.interpolation
+        older = newer = None
+        for tick in self.received:
+            if tick <= render_tick:
+                older = tick
+            elif newer is None:
+                newer = tick
+        if older is None:
+            older = self.received[0]
+        if newer is None or newer <= older:
+            self.extrapolated += 1
+            state = dict(self.snapshots[older])
+        else:
+            a, b = self.snapshots[older], self.snapshots[newer]
+            t = (render_tick - older) / (newer - older)
+            state = {}
+            for key, values in a.items():
+                other = b.get(key)
+                if other is None or key & 3 == GLOBAL:
+                    state[key] = values
+                else:
+                    state[key] = (round(values[0] + (other[0] - values[0]) * t),
+                                  round(values[1] + (other[1] - values[1]) * t)) + values[2:]
+        own = self.slot << 2 | PLAYER
+        latest = self.snapshots[self.latest]
+        if own in latest:
+            state[own] = (round(self.player.x), round(self.player.y)) + latest[own][2:]
+        return state
+
+    async def run(self, seconds=None, screen=None):
+        loop = asyncio.get_running_loop()
+        while not self.welcomed.is_set():
+            self.send(bytes([HELLO]))
+            try:
+                await asyncio.wait_for(self.welcomed.wait(), 0.5)
+            except asyncio.TimeoutError:
+                pass
+        if self.rejected:
+            return
+        view = ClientView(self, screen) if screen is not None else None
+        interval = 1 / self.meta["rate"]
+        start = next_tick = loop.time()
+        while seconds is None or loop.time() - start < seconds:
+            if self.latest:
+                if view is not None:
+                    direction, slash, running = view.read_input()
+                    if not running:
+                        break
+                else:
+                    direction, slash = self.bot(None)
+                self.send_input(direction, slash)
+                state = self.view(time.perf_counter())
+                if view is not None:
+                    view.draw(state)
+            next_tick += interval
+            await asyncio.sleep(max(next_tick - loop.time(), 0))
+        self.send(bytes([BYE]))
+
+    def report(self, seconds):
+        seconds = seconds or 1
+        return (f"client {self.slot}: down {self.bytes_in / seconds / 1024:.2f} kB/s, "
+                f"up {self.bytes_out / seconds / 1024:.2f} kB/s, "
+                f"mispredicted {self.mispredicted}/{self.predicted}, {self.late} late, "
+                f"{self.no_baseline} without baseline, {self.extrapolated}/{self.frames} frames past the newest snapshot")
+
+
+class ClientView:
+    def __init__(self, client, screen):
+        self.client = client
+        self.screen = screen
+        self.camera = Camera(width, height)
+        sheet, columns, rows = ENEMIES[client.meta["enemy_type"]]
+        self.enemy_frames = load_frames(f"enemies/{sheet}", columns, rows, 1.5)[0]
+        self.effect_frames = load_frames("particles/explosion.png", 12, 1, 1.5)[0]
+        self.bee = sheet == 'bee.png'
+        self.bars = {}
+        self.health = Health(400, 80, 200, 20, 10)
+        self.font = pygame.font.Font("data/dungeon_font/ThaleahFat.ttf", 60)
+        self.font2 = pygame.font.Font("data/dungeon_font/ThaleahFat.ttf", 30)
+        self.text_cache = TextCache()
+
+    def read_input(self):
+        slash = False
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                return None, False, False
+            if event.type == pygame.MOUSEBUTTONDOWN or (event.type == pygame.KEYDOWN and event.key == pygame.K_e):
+                slash = True
+        return read_direction(pygame.key.get_pressed()), slash, True
+
+    def draw(self, state):
+        client = self.client
+        camera = self.camera
+        camera.follow(client.player.hitbox, client.map)
+        x, y = camera.offset
+        sprites = []
+        bars = []
+        for kind in (ENEMY, EFFECT, PLAYER):
+            for key, values in state.items():
+                if key & 3 != kind:
+                    continue
+                if kind == ENEMY:
+                    sprites.append((self.enemy_frames[values[2]], (values[0] - x, values[1] - y)))
+                    bar = self.bars.get(key)
+                    if bar is None:
+                        bar = self.bars[key] = Health(0, 0, 50, 10, LEVELS[client.levels.index][1])
+                    bar.hp = values[3]
+                    offset = 0 if self.bee else 22
+                    bars.append((bar.get_image(), (values[0] + offset - x, values[1] - 20 - y)))
+                elif kind == EFFECT:
+                    sprites.append((self.effect_frames[values[2]], (values[0] - x, values[1] - y)))
+                else:
+                    sprites.append((client.player.frames[values[2]], (values[0] - x, values[1] - y)))
+                    if key >> 2 == client.slot:
+                        self.health.hp = values[3]
+        _, _, counter, kills, result = state[GLOBAL]
+        text = ' ' + RESULTS[result].upper() if result else ' ' + str(counter)
+        self.screen.fill((0, 0, 0))
+        self.screen.blits(camera.map_surfaces(client.map), doreturn=False)
+        self.screen.blits(sprites, doreturn=False)
+        self.screen.blits(bars, doreturn=False)
+        self.screen.blits([(self.text_cache.render(self.font, text, "white"), (32, 48)),
+                           (self.text_cache.render(self.font, str(kills), "white"), (550, 370)),
+                           (self.text_cache.render(self.font2, "health:", "white"), (400, 50)),
+                           (self.health.get_image(), (self.health.x, self.health.y))], doreturn=False)
+        pygame.display.flip()
+
+
+async def serve(args, levels, seconds=None):
+    levels.index = args.level
+    world = World(width, height, tile_size, args.enemy_type, levels.current.enemy_hp, map=levels.current.map,
+                  seed=args.seed, player_count=2)
+    loop = asyncio.get_running_loop()
+    transport, server = await loop.create_datagram_endpoint(
+        lambda: Server(world, levels, args.rate, loss=args.loss, seed=args.seed), local_addr=(args.host, args.port))
+    return transport, server
+
+
+async def connect(args, levels, port, bot=None, seed=None):
+    loop = asyncio.get_running_loop()
+    transport, client = await loop.create_datagram_endpoint(
+        lambda: Client(levels, bot, args.interpolation, args.loss, seed), remote_addr=(args.host, port))
+    return transport, client
+
+
+async def bench(args):
+    # a server and bot clients in one process, talking over real UDP sockets on loopback
+    levels = LevelManager(tile_size, preload=False)
+    transport, server = await serve(args, levels)
+    port = transport.get_extra_info("sockname")[1]
+    clients = [await connect(args, LevelManager(tile_size, preload=False), port, RandomBot(args.seed + i),
+                             args.seed + i) for i in range(args.clients)]
+    await asyncio.gather(server.run(args.seconds + 0.5), *[client.run(args.seconds) for _, client in clients])
+    print(server.report())
+    for client_transport, client in clients:
+        if not client.rejected:
+            print(client.report(args.seconds))
+        client_transport.close()
+    transport.close()
+
+
+async def host(args):
+    init()
+    transport, server = await serve(args, LevelManager(tile_size, preload=False))
+    print(f"сервер слушает {args.host}:{args.port}")
+    try:
+        await server.run(args.seconds)
+    finally:
+        print(server.report())
+        transport.close()
+
+
+async def join(args):
+    screen = None
+    if args.bot:
+        init()
+    else:
+        pygame.init()
+        screen = pygame.display.set_mode((width, height))
+    levels = LevelManager(tile_size, preload=False)
+    transport, client = await connect(args, levels, args.port, RandomBot(args.seed) if args.bot else None, args.seed)
+    start = time.perf_counter()
+    await client.run(args.seconds, screen)
+    if client.rejected:
+        print("Сервер заполнен")
+    else:
+        print(client.report(time.perf_counter() - start))
+    transport.close()
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Two-player mode: an authoritative UDP server and thin clients")
+    parser.add_argument("mode", choices=["server", "client", "bench"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--rate", type=int, default=FPS, help="server ticks per second")
+    parser.add_argument("--seconds", type=float, default=None)
+    parser.add_argument("--level", type=int, default=0)
+    parser.add_argument("--enemy-type", choices=list(ENEMIES), default="eyeball")
+    parser.add_argument("--interpolation", type=float, default=2, help="ticks remote entities are drawn behind")
+    parser.add_argument("--loss", type=float, default=0.0, help="share of packets dropped on purpose")
+    parser.add_argument("--clients", type=int, default=2)
+    parser.add_argument("--bot", action="store_true", help="the client plays with a random bot, without a window")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    if args.mode == "bench":
+        init()
+        args.port = 0
+        args.seconds = args.seconds or 10
+        asyncio.run(bench(args))
+    elif args.mode == "server":
+        asyncio.run(host(args))
+    else:
+        asyncio.run(join(args))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
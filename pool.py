@@ -0,0 +1,124 @@
+import gc
+import time
+
+import pygame
+
+
+class Pool:
+    def __init__(self, factory):
+        self.factory = factory
+        self.free = []
+        self.created = 0
+        self.reused = 0
+        self.in_use = 0
+        self.peak = 0
+
+    def acquire(self, *args, **kwargs):
+        if self.free:
+            item = self.free.pop()
+            item.reset(*args, **kwargs)
+            self.reused += 1
+        else:
+            item = self.factory(*args, **kwargs)
+            self.created += 1
+        self.in_use += 1
+        self.peak = max(self.peak, self.in_use)
+        return item
+
+    def release(self, item):
+        self.in_use -= 1
+        self.free.append(item)
+
+    def stats(self):
+        return {"created": self.created, "reused": self.reused, "in_use": self.in_use,
+                "free": len(self.free), "peak": self.peak}
+
+
+class Explosion:
+    __slots__ = ("frames", "speed", "image", "rect", "frame", "frame_time")
+
+    def __init__(self, frames, x, y, speed=0.05):
+        self.frames = frames
+        self.speed = speed
+        self.rect = pygame.Rect((x, y), frames[0].get_size())
+        self.reset(x, y)
+
+    def reset(self, x, y):
+        self.rect.topleft = (x, y)
+        self.frame = 0
+        self.frame_time = 0
+        self.image = self.frames[0]
+
+    def update(self, dt):
+        # returns False once the last frame has been shown
+        self.frame_time += dt
+        if self.frame_time >= self.speed:
+            self.frame += 1
+            if self.frame >= len(self.frames):
+                return False
+            self.image = self.frames[self.frame]
+            self.frame_time = 0
+        return True
+
+
+class Effects:
+    def __init__(self, frames):
+        self.pool = Pool(lambda x, y: Explosion(frames, x, y))
+        self.active = []
+
+    def __iter__(self):
+        return iter(self.active)
+
+    def __len__(self):
+        return len(self.active)
+
+    def spawn(self, x, y):
+        effect = self.pool.acquire(x, y)
+        self.active.append(effect)
+        return effect
+
+    def update(self, dt):
+        alive = []
+        for effect in self.active:
+            if effect.update(dt):
+                alive.append(effect)
+            else:
+                self.pool.release(effect)
+        self.active = alive
+
+    def clear(self):
+        for effect in self.active:
+            self.pool.release(effect)
+        self.active = []
+
+
+class GCMonitor:
+    def __init__(self):
+        self.collections = [0, 0, 0]
+        self.pauses = []
+        self.started = None
+
+    def callback(self, phase, info):
+        if phase == "start":
+            self.started = time.perf_counter()
+        elif self.started is not None:
+            self.pauses.append((time.perf_counter() - self.started) * 1000)
+            self.collections[info["generation"]] += 1
+            self.started = None
+
+    def install(self):
+        if self.callback not in gc.callbacks:
+            gc.callbacks.append(self.callback)
+        return self
+
+    def remove(self):
+        if self.callback in gc.callbacks:
+            gc.callbacks.remove(self.callback)
+
+    def reset(self):
+        self.collections = [0, 0, 0]
+        self.pauses = []
+
+    def stats(self):
+        return {"collections": list(self.collections), "pause_ms": sum(self.pauses),
+                "max_pause_ms": max(self.pauses, default=0)}
@@ -0,0 +1,94 @@
+import csv
+import json
+import time
+from collections import deque
+
+import pygame
+
+
+def profile_path(argv):
+    for arg in argv:
+        if arg.startswith('--profile'):
+            return arg.partition('=')[2] or 'profile.json'
+    return None
+
+
+class FrameProfiler:
+    def __init__(self, size=600, overlay_every=10):
+        self.size = size
+        self.overlay_every = overlay_every
+        self.phases = []
+        self.history = {}
+        self.totals = deque(maxlen=size)
+        self.trace = deque(maxlen=size)
+        self.frames = 0
+        self.current = {}
+        self.mark = self.start = time.perf_counter()
+        self.overlay = None
+        self.show = False
+
+    def begin(self):
+        self.current = {}
+        self.mark = self.start = time.perf_counter()
+
+    def lap(self, name):
+        now = time.perf_counter()
+        self.current[name] = self.current.get(name, 0) + (now - self.mark) * 1000
+        self.mark = now
+
+    def end(self):
+        for name in self.current:
+            if name not in self.history:
+                self.phases.append(name)
+                self.history[name] = deque(maxlen=self.size)
+        for name in self.phases:
+            self.history[name].append(self.current.get(name, 0))
+        self.totals.append((time.perf_counter() - self.start) * 1000)
+        self.trace.append(self.current)
+        self.frames += 1
+
+    def percentiles(self, values, points=(50, 95, 99)):
+        values = sorted(values)
+        if not values:
+            return [0] * len(points)
+        return [values[min(len(values) - 1, len(values) * p // 100)] for p in points]
+
+    def summary(self):
+        result = {}
+        for name in self.phases + ["total"]:
+            values = self.totals if name == "total" else self.history[name]
+            p50, p95, p99 = self.percentiles(values)
+            result[name] = {"p50": p50, "p95": p95, "p99": p99,
+                            "mean": sum(values) / len(values) if values else 0}
+        return result
+
+    def get_overlay(self, font):
+        if self.overlay is None or self.frames % self.overlay_every == 0:
+            rows = [("phase", "p50", "p95", "p99")]
+            for name, stats in self.summary().items():
+                rows.append((name, f"{stats['p50']:.2f}", f"{stats['p95']:.2f}", f"{stats['p99']:.2f}"))
+            line_height = font.get_linesize()
+            column = 48
+            self.overlay = pygame.Surface((70 + column * 3 + 8, line_height * len(rows) + 8), pygame.SRCALPHA)
+            self.overlay.fill((0, 0, 0, 160))
+            for i, row in enumerate(rows):
+                y = 4 + i * line_height
+                self.overlay.blit(font.render(row[0], True, "white"), (4, y))
+                for j, cell in enumerate(row[1:]):
+                    text = font.render(cell, True, "white")
+                    self.overlay.blit(text, (70 + column * (j + 1) - text.get_width(), y))
+        return self.overlay
+
+    def export(self, path, extra=None):
+        if path.endswith(".csv"):
+            with open(path, "w", newline="") as file:
+                writer = csv.writer(file)
+                writer.writerow(["frame"] + self.phases + ["total"])
+                first = self.frames - len(self.trace)
+                for i, (frame, total) in enumerate(zip(self.trace, self.totals)):
+                    writer.writerow([first + i] + [round(frame.get(name, 0), 4) for name in self.phases]
+                                    + [round(total, 4)])
+        else:
+            with open(path, "w") as file:
+                json.dump(dict({"frames": self.frames, "summary": self.summary(),
+                                "trace": list(self.trace)}, **(extra or {})), file, indent=1)
@@ -0,0 +1,150 @@
+from collections import OrderedDict
+
+import pygame
+
+MAP, SPRITES, BARS, HUD = range(4)
+LAYER_NAMES = {MAP: "map", SPRITES: "sprites", BARS: "bars", HUD: "hud"}
+tiles_group = pygame.sprite.Group()
+
+
+def merge_rects(rects):
+    merged = []
+    for rect in rects:
+        rect = rect.copy()
+        i = rect.collidelist(merged)
+        while i != -1:
+            rect.union_ip(merged.pop(i))
+            i = rect.collidelist(merged)
+        merged.append(rect)
+    return merged
+
+
+class DirtyRenderer:
+    def __init__(self, screen):
+        self.screen = screen
+        self.background = None
+        self.drawn = {}
+        self.full = True
+
+    def set_background(self, background):
+        self.background = background
+        self.full = True
+
+    def invalidate(self):
+        self.full = True
+
+    def draw(self, items):
+        # items are (key, surface, pos, token); an item counts as unchanged when the
+        # token (or, without a token, the surface itself) and the rect are the same
+        current = {}
+        dirty = []
+        for key, surface, pos, token in items:
+            rect = surface.get_rect(topleft=pos)
+            current[key] = (surface, token, rect)
+            old = self.drawn.get(key)
+            if old is None:
+                dirty.append(rect)
+                continue
+            old_surface, old_token, old_rect = old
+            same = old_token == token if token is not None else old_surface is surface
+            if not same or old_rect != rect:
+                dirty.append(rect)
+                dirty.append(old_rect)
+        for key, (_, _, old_rect) in self.drawn.items():
+            if key not in current:
+                dirty.append(old_rect)
+        self.drawn = current
+
+        if self.full:
+            self.screen.blit(self.background, (0, 0))
+            for surface, _, rect in current.values():
+                self.screen.blit(surface, rect)
+            pygame.display.flip()
+            self.full = False
+            return [self.screen.get_rect()]
+
+        bounds = self.screen.get_rect()
+        dirty = [rect.clip(bounds) for rect in merge_rects(dirty)]
+        dirty = [rect for rect in dirty if rect.w and rect.h]
+        for rect in dirty:
+            self.screen.blit(self.background, rect, rect)
+        for surface, _, rect in current.values():
+            for area in dirty:
+                clipped = rect.clip(area)
+                if clipped.w and clipped.h:
+                    self.screen.blit(surface, clipped, clipped.move(-rect.x, -rect.y))
+        if dirty:
+            pygame.display.update(dirty)
+        return dirty
+
+
+class TextCache:
+    def __init__(self, limit=256):
+        self.limit = limit
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font, text, color, antialias=False):
+        key = (font, text, color, antialias)
+        surface = self.entries.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return surface
+        self.misses += 1
+        surface = self.entries[key] = font.render(text, antialias, color)
+        if len(self.entries) > self.limit:
+            self.entries.popitem(last=False)
+        return surface
+
+
+class RenderQueue:
+    def __init__(self):
+        self.layers = {}
+        self.calls = 0
+        self.items = 0
+
+    def add(self, surface, dest, layer=0):
+        self.layers.setdefault(layer, []).append((surface, dest))
+
+    def extend(self, pairs, layer=0):
+        self.layers.setdefault(layer, []).extend(pairs)
+
+    def add_group(self, group, layer=0):
+        self.extend([(sprite.image, sprite.rect) for sprite in group], layer)
+
+    def reset_stats(self):
+        self.calls = 0
+        self.items = 0
+
+    def flush(self, target, profiler=None):
+        for layer in sorted(self.layers):
+            sequence = self.layers[layer]
+            if sequence:
+                target.blits(sequence, doreturn=False)
+                self.calls += 1
+                self.items += len(sequence)
+            if profiler is not None:
+                profiler.lap(LAYER_NAMES.get(layer, str(layer)))
+        self.layers.clear()
+
+
+def queue_frame(queue, map, world, hud, camera=None):
+    if camera is None:
+        queue.extend(map.surfaces(), MAP)
+        queue.add_group(world.enemy_group, SPRITES)
+        queue.add_group(world.effects, SPRITES)
+        queue.add_group(tiles_group, SPRITES)
+        queue.add_group(world.player_group, SPRITES)
+    else:
+        queue.extend(camera.map_surfaces(map), MAP)
+        for group in (world.enemy_group, world.effects, tiles_group, world.player_group):
+            queue.extend(camera.sprites(group), SPRITES)
+    health = world.player.health
+    queue.add(health.get_image(), (health.x, health.y), BARS)
+    x, y = camera.offset if camera else (0, 0)
+    for enemy in world.enemy_group:
+        if enemy.health:
+            queue.add(enemy.health.get_image(), (enemy.health.x - x, enemy.health.y - y), BARS)
+    queue.extend(hud, HUD)
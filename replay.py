@@ -0,0 +1,215 @@
+import json
+import struct
+import sys
+import time
+
+from headless import width, height, tile_size
+from levels import LevelManager
+from render import RenderQueue, queue_frame
+from world import World
+
+MAGIC = b"PGRP"
+VERSION = 1
+HEADER = struct.Struct("<4sHI")
+DIRECTIONS = [None, 'left', 'right', 'up', 'down']
+
+
+def write_varint(out, value):
+    while value >= 0x80:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data, offset):
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def encode_input(direction, slash):
+    return DIRECTIONS.index(direction) << 1 | bool(slash)
+
+
+def decode_input(code):
+    return DIRECTIONS[code >> 1], bool(code & 1)
+
+
+class Round:
+    def __init__(self, seed, level, enemy_hp):
+        self.seed = seed
+        self.level = level
+        self.enemy_hp = enemy_hp
+        # input is stored as (code, repeat) runs: a new run only starts when the input changes
+        self.runs = []
+        self.checksums = []
+        self.ticks = 0
+
+    def add(self, code):
+        if self.runs and self.runs[-1][0] == code:
+            self.runs[-1][1] += 1
+        else:
+            self.runs.append([code, 1])
+        self.ticks += 1
+
+    def inputs(self):
+        for code, repeat in self.runs:
+            direction, slash = decode_input(code)
+            for _ in range(repeat):
+                yield direction, slash
+
+
+class Recorder:
+    def __init__(self, enemy_type, enemy_count=4, checksum_every=10, enemy_speed=0, equipment=None, steps=None,
+                 round_time=None, dt=None):
+        self.enemy_type = enemy_type
+        self.enemy_count = enemy_count
+        self.enemy_speed = enemy_speed
+        # None keeps the World default; recordings made before these were stored have none of them
+        self.equipment = tuple(equipment) if equipment is not None else None
+        self.steps = steps
+        self.round_time = round_time
+        self.dt = dt
+        self.checksum_every = checksum_every
+        self.rounds = []
+        self.round = None
+
+    def world_options(self):
+        # everything besides the round itself that changes how a round plays out
+        options = {"enemy_count": self.enemy_count, "enemy_speed": self.enemy_speed}
+        for name in ("equipment", "steps", "round_time", "dt"):
+            if getattr(self, name) is not None:
+                options[name] = getattr(self, name)
+        return options
+
+    def start_round(self, world, level=0):
+        self.round = Round(world.seed, level, world.enemy_hp)
+        self.rounds.append(self.round)
+
+    def record(self, world, direction, slash):
+        # called after world.step(direction, slash) for every tick of the round
+        if self.round is None:
+            return
+        self.round.add(encode_input(direction, slash))
+        if world.stop or world.ticks % self.checksum_every == 0:
+            self.round.checksums.append((world.ticks, world.checksum()))
+        if world.stop:
+            self.round = None
+
+    def save(self, path):
+        meta = json.dumps({"enemy_type": self.enemy_type, "enemy_count": self.enemy_count,
+                           "checksum_every": self.checksum_every, "enemy_speed": self.enemy_speed,
+                           "equipment": self.equipment, "steps": self.steps, "round_time": self.round_time,
+                           "dt": self.dt}).encode("utf-8")
+        out = bytearray(HEADER.pack(MAGIC, VERSION, len(meta)))
+        out += meta
+        write_varint(out, len(self.rounds))
+        for round in self.rounds:
+            for value in (round.seed, round.level, round.enemy_hp, len(round.runs)):
+                write_varint(out, value)
+            for code, repeat in round.runs:
+                out.append(code)
+                write_varint(out, repeat)
+            write_varint(out, len(round.checksums))
+            last = 0
+            for tick, checksum in round.checksums:
+                write_varint(out, tick - last)
+                out += struct.pack("<I", checksum)
+                last = tick
+        with open(path, "wb") as file:
+            file.write(out)
+        return len(out)
+
+
+def load(path):
+    with open(path, "rb") as file:
+        data = file.read()
+    magic, version, meta_len = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a replay")
+    offset = HEADER.size + meta_len
+    recorder = Recorder(**json.loads(data[HEADER.size:offset]))
+    count, offset = read_varint(data, offset)
+    for _ in range(count):
+        values = []
+        for _ in range(4):
+            value, offset = read_varint(data, offset)
+            values.append(value)
+        seed, level, enemy_hp, run_count = values
+        round = Round(seed, level, enemy_hp)
+        for _ in range(run_count):
+            code = data[offset]
+            repeat, offset = read_varint(data, offset + 1)
+            round.runs.append([code, repeat])
+            round.ticks += repeat
+        checksum_count, offset = read_varint(data, offset)
+        tick = 0
+        for _ in range(checksum_count):
+            delta, offset = read_varint(data, offset)
+            tick += delta
+            round.checksums.append((tick, struct.unpack_from("<I", data, offset)[0]))
+            offset += 4
+        recorder.rounds.append(round)
+    return recorder
+
+
+def replay(recording, profiler=None, screen=None):
+    levels = LevelManager(tile_size, preload=False)
+    world = None
+    queue = RenderQueue()
+    mismatches = []
+    for number, round in enumerate(recording.rounds):
+        levels.index = round.level
+        map = levels.current.map
+        if world is None:
+            world = World(width, height, tile_size, recording.enemy_type, round.enemy_hp, map=map,
+                          profiler=profiler, **recording.world_options())
+        world.map = map
+        world.enemy_hp = round.enemy_hp
+        world.new_game(seed=round.seed)
+        expected = dict(round.checksums)
+        for direction, slash in round.inputs():
+            if profiler is not None:
+                profiler.begin()
+            world.step(direction, slash)
+            if screen is not None:
+                screen.fill((0, 0, 0))
+                queue_frame(queue, map, world, [])
+                queue.flush(screen, profiler)
+            if profiler is not None:
+                profiler.end()
+            checksum = expected.get(world.ticks)
+            if checksum is not None and checksum != world.checksum():
+                mismatches.append((number, world.ticks))
+                break
+    return mismatches
+
+
+if __name__ == '__main__':
+    import pygame
+    from headless import init
+    from profiler import FrameProfiler, profile_path
+
+    if len(sys.argv) < 2:
+        print("Использование: python replay.py запись.rpl [--render] [--profile[=trace.json]]")
+        sys.exit()
+    init()
+    recording = load(sys.argv[1])
+    profile = profile_path(sys.argv[2:])
+    profiler = FrameProfiler(size=sum(round.ticks for round in recording.rounds) or 1) if profile else None
+    screen = pygame.display.set_mode((640, 480)) if '--render' in sys.argv else None
+    start = time.perf_counter()
+    mismatches = replay(recording, profiler, screen)
+    elapsed = time.perf_counter() - start
+    ticks = sum(round.ticks for round in recording.rounds)
+    print(f"{len(recording.rounds)} rounds, {ticks} ticks replayed in {elapsed:.2f}s ({ticks / elapsed:.0f} ticks/s)")
+    if profiler:
+        profiler.export(profile)
+    for number, tick in mismatches:
+        print(f"round {number}: state diverged at tick {tick}")
+    sys.exit(1 if mismatches else 0)
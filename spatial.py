@@ -0,0 +1,66 @@
+class SpatialHash:
+    def __init__(self, cell_size=16):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.items = {}
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, item):
+        return item in self.items
+
+    def cell_range(self, rect):
+        size = self.cell_size
+        return (rect.left // size, rect.top // size,
+                (rect.right - 1) // size, (rect.bottom - 1) // size)
+
+    def insert(self, item, rect):
+        bounds = self.cell_range(rect)
+        self.items[item] = (rect.copy(), bounds)
+        x0, y0, x1, y1 = bounds
+        for cy in range(y0, y1 + 1):
+            for cx in range(x0, x1 + 1):
+                # dicts keep insertion order, so queries are deterministic
+                self.cells.setdefault((cx, cy), {})[item] = None
+
+    def remove(self, item):
+        entry = self.items.pop(item, None)
+        if entry is None:
+            return
+        x0, y0, x1, y1 = entry[1]
+        for cy in range(y0, y1 + 1):
+            for cx in range(x0, x1 + 1):
+                cell = self.cells[(cx, cy)]
+                del cell[item]
+                if not cell:
+                    del self.cells[(cx, cy)]
+
+    def move(self, item, rect):
+        entry = self.items.get(item)
+        if entry is not None and entry[1] == self.cell_range(rect):
+            entry[0].update(rect)
+            return
+        self.remove(item)
+        self.insert(item, rect)
+
+    def clear(self):
+        self.cells.clear()
+        self.items.clear()
+
+    def query(self, rect):
+        found = {}
+        x0, y0, x1, y1 = self.cell_range(rect)
+        for cy in range(y0, y1 + 1):
+            for cx in range(x0, x1 + 1):
+                cell = self.cells.get((cx, cy))
+                if not cell:
+                    continue
+                for item in cell:
+                    if item not in found and self.items[item][0].colliderect(rect):
+                        found[item] = None
+        return list(found)
+
+    def first(self, rect):
+        found = self.query(rect)
+        return found[0] if found else None
@@ -0,0 +1,146 @@
+import numpy as np
+from assets import load_frames
+from entities import Health
+from world import ENEMIES
+
+ALIVE, EXPLODING, DEAD = 0, 1, 2
+# step() drops the dead rows once they are this share of the arrays
+COMPACT_SHARE = 0.5
+
+
+class Swarm:
+    def __init__(self, enemy_type, scale=1.5, animation_speed=0.2, explode_speed=0.05):
+        sheet, columns, rows = ENEMIES[enemy_type]
+        frames, _ = load_frames(f"enemies/{sheet}", columns, rows, scale)
+        self.columns = columns
+        self.rows = [frames[row * columns:(row + 1) * columns] for row in range(rows)]
+        self.explosion, _ = load_frames("particles/explosion.png", 12, 1, 1.5)
+        self.animation_speed = animation_speed
+        self.explode_speed = explode_speed
+        # bees carry their health bar over the left edge, everyone else shifts it right
+        self.bar_offset = 0 if sheet == 'bee.png' else 22
+        self.bars = {}
+
+        bodies = [row[0].get_bounding_rect() for row in self.rows]
+        self.body = np.array([(b.x, b.y, b.w, b.h) for b in bodies], dtype=np.int32)
+
+        self.x = np.zeros(0, dtype=np.float64)
+        self.y = np.zeros(0, dtype=np.float64)
+        self.row = np.zeros(0, dtype=np.int32)
+        self.frame = np.zeros(0, dtype=np.int32)
+        self.timer = np.zeros(0, dtype=np.float64)
+        self.hp = np.zeros(0, dtype=np.int32)
+        self.max_hp = 3
+        self.state = np.zeros(0, dtype=np.uint8)
+
+    def __len__(self):
+        return int(np.count_nonzero(self.state != DEAD))
+
+    def spawn(self, xs, ys, max_hp=3, rng=None):
+        rng = rng or np.random.default_rng()
+        count = len(xs)
+        self.x = np.concatenate([self.x, np.asarray(xs, dtype=np.float64)])
+        self.y = np.concatenate([self.y, np.asarray(ys, dtype=np.float64)])
+        self.row = np.concatenate([self.row, rng.integers(0, len(self.rows), count, dtype=np.int32)])
+        self.frame = np.concatenate([self.frame, np.zeros(count, dtype=np.int32)])
+        self.timer = np.concatenate([self.timer, np.zeros(count, dtype=np.float64)])
+        self.hp = np.concatenate([self.hp, np.full(count, max_hp, dtype=np.int32)])
+        self.state = np.concatenate([self.state, np.zeros(count, dtype=np.uint8)])
+        if max_hp != self.max_hp:
+            self.bars.clear()
+            self.max_hp = max_hp
+
+    def compact(self):
+        keep = self.state != DEAD
+        for name in ("x", "y", "row", "frame", "timer", "hp", "state"):
+            setattr(self, name, getattr(self, name)[keep])
+
+    def hitboxes(self):
+        body = self.body[self.row]
+        left = self.x.astype(np.int32) + body[:, 0]
+        top = self.y.astype(np.int32) + body[:, 1]
+        return left, top, left + body[:, 2], top + body[:, 3]
+
+    def touching(self, rect):
+        left, top, right, bottom = self.hitboxes()
+        return ((left < rect.right) & (right > rect.left) & (top < rect.bottom) & (bottom > rect.top)
+                & (self.state == ALIVE))
+
+    def chase(self, field, speed):
+        # every alive enemy reads its next tile from the shared flow field at once
+        left, top, right, bottom = self.hitboxes()
+        cx, cy = (left + right) // 2, (top + bottom) // 2
+        size = field.tile_size
+        tx = np.clip(cx // size, 0, field.width - 1)
+        ty = np.clip(cy // size, 0, field.height - 1)
+        dx, dy = field.dx[ty, tx], field.dy[ty, tx]
+        moving = (self.state == ALIVE) & ((dx != 0) | (dy != 0))
+        self.x += np.where(moving, np.clip((tx + dx) * size + size // 2 - cx, -speed, speed), 0)
+        self.y += np.where(moving, np.clip((ty + dy) * size + size // 2 - cy, -speed, speed), 0)
+
+    def step(self, dt, player=None):
+        # without this every tick would still go over all enemies ever spawned, not the live ones
+        dead = int(np.count_nonzero(self.state == DEAD))
+        if dead and dead >= len(self.state) * COMPACT_SHARE:
+            self.compact()
+        active = self.state != DEAD
+        alive = self.state == ALIVE
+        exploding = self.state == EXPLODING
+        self.timer[active] += dt
+        speed = np.where(alive, self.animation_speed, self.explode_speed)
+        due = active & (self.timer >= speed)
+        self.timer[due] = 0
+
+        advance = due & alive
+        self.frame[advance] = (self.frame[advance] + 1) % self.columns
+        burst = due & exploding
+        self.frame[burst] += 1
+        self.state[burst & (self.frame >= len(self.explosion))] = DEAD
+
+        # the attack lands on the fifth frame of the cycle, like Enemy.update
+        if player is None:
+            return False
+        strikes = advance & (self.frame == 4)
+        if not strikes.any():
+            return False
+        hits = int(np.count_nonzero(strikes & self.touching(player.hitbox)))
+        if hits and player.health.hp > 0:
+            player.health.hp = max(player.health.hp - hits, 0)
+            return player.health.hp == 0
+        return False
+
+    def hit(self, rect, damage=1):
+        candidates = np.flatnonzero(self.touching(rect))
+        if not len(candidates):
+            return False
+        i = candidates[0]
+        self.hp[i] -= damage
+        if self.hp[i] > 0:
+            return False
+        self.state[i] = EXPLODING
+        self.frame[i] = 0
+        self.timer[i] = 0
+        self.x[i] -= 30
+        self.y[i] -= 20
+        return True
+
+    def bar(self, hp):
+        image = self.bars.get(hp)
+        if image is None:
+            health = Health(0, 0, 50, 10, self.max_hp)
+            health.hp = hp
+            image = self.bars[hp] = health.get_image()
+        return image
+
+    def draw(self, surface, bars=True):
+        rows, explosion = self.rows, self.explosion
+        xs, ys = self.x.tolist(), self.y.tolist()
+        row, frame = self.row.tolist(), self.frame.tolist()
+        alive = np.flatnonzero(self.state == ALIVE).tolist()
+        sequence = [(rows[row[i]][frame[i]], (xs[i], ys[i])) for i in alive]
+        sequence += [(explosion[frame[i]], (xs[i], ys[i]))
+                     for i in np.flatnonzero(self.state == EXPLODING).tolist()]
+        if bars:
+            hp, offset = self.hp.tolist(), self.bar_offset
+            sequence += [(self.bar(hp[i]), (xs[i] + offset, ys[i] - 20)) for i in alive]
+        surface.blits(sequence, doreturn=False)
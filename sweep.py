@@ -0,0 +1,134 @@
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from headless import bots, init, run_round, width, height, tile_size
+from levels import LevelManager, LEVELS
+from world import World, ENEMIES
+
+RESULTS = ["victory", "game over", "timeout"]
+PARAMETERS = ["level", "enemy_type", "enemy_hp", "enemy_count", "steps", "round_time"]
+COLUMNS = [("level", np.int8), ("enemy_type", np.int8), ("enemy_hp", np.int16), ("enemy_count", np.int16),
+           ("steps", np.int16), ("round_time", np.int16), ("bot", np.int8), ("seed", np.uint32),
+           ("result", np.int8), ("kills", np.int16), ("ticks", np.int32), ("time_to_clear", np.float32),
+           ("hp_left", np.int16)]
+
+worlds = {}
+levels = None
+
+
+def init_worker():
+    # each worker loads the maps and sheets once; every round after that reuses them
+    global levels
+    init()
+    levels = LevelManager(16, preload=False)
+    for index in range(len(LEVELS)):
+        levels.get(index)
+
+
+def get_world(level, enemy_type, enemy_count, steps):
+    key = (level, enemy_type, enemy_count, steps)
+    world = worlds.get(key)
+    if world is None:
+        world = worlds[key] = World(width, height, tile_size, enemy_type, steps=steps, enemy_count=enemy_count,
+                                    map=levels.get(level).map)
+    return world
+
+
+def run_batch(params, bot_name, seeds, max_ticks):
+    world = get_world(params["level"], params["enemy_type"], params["enemy_count"], params["steps"])
+    world.enemy_hp = params["enemy_hp"]
+    world.round_time = params["round_time"]
+    rows = []
+    for seed in seeds:
+        run_round(world, bots[bot_name](seed), max_ticks, seed)
+        result = world.result or "timeout"
+        cleared = world.ticks * world.dt if result == "victory" else float("nan")
+        rows.append(dict(params, bot=bot_name, seed=seed, result=result, kills=world.kills, ticks=world.ticks,
+                         time_to_clear=cleared, hp_left=world.player.health.hp))
+    return rows
+
+
+class ColumnWriter:
+    # one raw binary file per column, appended as batches finish; schema.json says how to read them
+    def __init__(self, directory, categories):
+        self.directory = directory
+        self.categories = categories
+        self.rows = 0
+        os.makedirs(directory, exist_ok=True)
+        self.files = {name: open(os.path.join(directory, f"{name}.bin"), "wb") for name, _ in COLUMNS}
+
+    def append(self, rows):
+        for name, dtype in COLUMNS:
+            values = [row[name] for row in rows]
+            if name in self.categories:
+                values = [self.categories[name].index(value) for value in values]
+            self.files[name].write(np.asarray(values, dtype=dtype).tobytes())
+        self.rows += len(rows)
+
+    def close(self):
+        for file in self.files.values():
+            file.close()
+        schema = {"rows": self.rows,
+                  "columns": [{"name": name, "dtype": np.dtype(dtype).str, "file": f"{name}.bin",
+                               "categories": self.categories.get(name)} for name, dtype in COLUMNS]}
+        with open(os.path.join(self.directory, "schema.json"), "w") as file:
+            json.dump(schema, file, indent=1)
+
+
+def read_columns(directory):
+    with open(os.path.join(directory, "schema.json")) as file:
+        schema = json.load(file)
+    return {column["name"]: np.fromfile(os.path.join(directory, column["file"]), dtype=column["dtype"])
+            for column in schema["columns"]}, schema
+
+
+def values(text, convert=int):
+    return [convert(value) for value in text.split(",")]
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Parallel headless balancing sweep")
+    parser.add_argument("--level", type=values, default=[0, 1, 2])
+    parser.add_argument("--enemy-type", type=lambda text: values(text, str), default=list(ENEMIES))
+    parser.add_argument("--enemy-hp", type=values, default=[3, 5, 10])
+    parser.add_argument("--enemy-count", type=values, default=[4])
+    parser.add_argument("--steps", type=values, default=[10])
+    parser.add_argument("--round-time", type=values, default=[20])
+    parser.add_argument("--bot", choices=["random", "chase"], default="chase")
+    parser.add_argument("--rounds", type=int, default=50, help="rounds per parameter combination")
+    parser.add_argument("--batch", type=int, default=25, help="rounds per worker task")
+    parser.add_argument("--max-ticks", type=int, default=100000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="sweep_results")
+    args = parser.parse_args(argv)
+
+    grid = [dict(zip(PARAMETERS, combination)) for combination in itertools.product(
+        args.level, args.enemy_type, args.enemy_hp, args.enemy_count, args.steps, args.round_time)]
+    categories = {"enemy_type": list(ENEMIES), "bot": ["random", "chase"], "result": RESULTS}
+    writer = ColumnWriter(args.out, categories)
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker) as executor:
+        futures = []
+        for number, params in enumerate(grid):
+            first = args.seed + number * args.rounds
+            for offset in range(0, args.rounds, args.batch):
+                seeds = range(first + offset, first + min(offset + args.batch, args.rounds))
+                futures.append(executor.submit(run_batch, params, args.bot, list(seeds), args.max_ticks))
+        for future in as_completed(futures):
+            writer.append(future.result())
+    writer.close()
+    elapsed = time.perf_counter() - start
+    print(f"{writer.rows} rounds over {len(grid)} combinations with {args.workers} workers in {elapsed:.2f}s "
+          f"({writer.rows / elapsed:.0f} rounds/s), results in {args.out}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,106 @@
+from collections import deque
+
+import numpy as np
+
+from flowfield import FlowField, MOVES
+
+LAYOUT = [
+    "..........",
+    ".#######..",
+    ".#.....#..",
+    ".#.###.#..",
+    ".#...#....",
+    ".#####.##.",
+    "......#...",
+    "####..#.#.",
+    "...#..#.#.",
+    "...#....#.",
+]
+
+
+class WallGrid:
+    # the parts of tilemap.Map the flow field reads
+    def __init__(self, layout, tile_size=16):
+        self.width = len(layout[0])
+        self.height = len(layout)
+        self.tile_size = tile_size
+        self.walls = bytearray(char == "#" for row in layout for char in row)
+        self.wall_changes = 0
+
+    def set_wall(self, x, y, wall):
+        self.walls[y * self.width + x] = wall
+        self.wall_changes += 1
+
+
+def bfs(grid, target):
+    distance = {target: 0}
+    queue = deque([target])
+    while queue:
+        x, y = queue.popleft()
+        for dx, dy in MOVES[1:]:
+            nx, ny = x + dx, y + dy
+            if (0 <= nx < grid.width and 0 <= ny < grid.height and not grid.walls[ny * grid.width + nx]
+                    and (nx, ny) not in distance):
+                distance[nx, ny] = distance[x, y] + 1
+                queue.append((nx, ny))
+    return distance
+
+
+def check(field, grid, target):
+    expected = bfs(grid, target)
+    for y in range(grid.height):
+        for x in range(grid.width):
+            assert field.distance[y, x] == expected.get((x, y), -1), (x, y)
+            dx, dy = field.step(x, y)
+            if (x, y) in expected and (x, y) != target:
+                # every step leads one tile closer, so following the field always arrives
+                assert expected.get((x + dx, y + dy)) == expected[x, y] - 1, (x, y)
+            elif grid.walls[y * grid.width + x]:
+                # an enemy pushed into a wall is led out to the closest reachable neighbour
+                reachable = [expected[x + mx, y + my] for mx, my in MOVES[1:] if (x + mx, y + my) in expected]
+                if reachable:
+                    assert expected.get((x + dx, y + dy)) == min(reachable), (x, y)
+                else:
+                    assert (dx, dy) == (0, 0)
+            else:
+                assert (dx, dy) == (0, 0)
+            assert (field.dx[y, x], field.dy[y, x]) == (dx, dy)
+
+
+def test_distances_and_steps_match_bfs():
+    grid = WallGrid(LAYOUT)
+    field = FlowField(grid)
+    for target in ((0, 0), (4, 4), (9, 9), (2, 2), (0, 9)):
+        field.compute(target)
+        check(field, grid, target)
+
+
+def test_enclosed_tiles_are_unreachable():
+    grid = WallGrid(LAYOUT)
+    field = FlowField(grid)
+    field.compute((0, 0))
+    assert field.distance[8, 0] == -1
+    assert field.step(0, 8) == (0, 0)
+
+
+def test_update_only_recomputes_on_changes():
+    grid = WallGrid(LAYOUT)
+    field = FlowField(grid)
+    assert field.update((5, 5))
+    assert not field.update((15, 15))
+    assert field.update((16, 15))
+    # opening the wall at (2, 7) joins the enclosed corner to the rest of the map
+    grid.set_wall(2, 7, 0)
+    assert field.update((16, 15))
+    assert field.recomputes == 3
+    check(field, grid, (1, 0))
+    assert field.distance[8, 0] > 0
+
+
+def test_target_outside_the_map():
+    grid = WallGrid(LAYOUT)
+    field = FlowField(grid)
+    field.compute((-1, 3))
+    assert (field.distance == -1).all()
+    assert not np.any(field.dx) and not np.any(field.dy)
+    assert field.next_center((40, 40)) is None
@@ -0,0 +1,76 @@
+import pytest
+
+from headless import init, width, height, tile_size
+from levels import LevelManager
+from net import (zigzag, unzigzag, capture, encode_snapshot, decode_snapshot, raw_size,
+                 GLOBAL, PLAYER, ENEMY, EFFECT)
+from world import World
+
+
+@pytest.mark.parametrize("value", [0, 1, -1, 2, -2, 63, -64, 1000, -1000, 2 ** 31, -2 ** 31])
+def test_zigzag_round_trip(value):
+    assert zigzag(value) >= 0
+    assert unzigzag(zigzag(value)) == value
+
+
+def test_zigzag_keeps_small_values_small():
+    assert [zigzag(value) for value in (0, -1, 1, -2, 2)] == [0, 1, 2, 3, 4]
+
+
+BASE = {
+    GLOBAL: (0, 1, 20, 0, 0),
+    0 << 2 | PLAYER: (300, 200, 0, 10),
+    0 << 2 | ENEMY: (40, 50, 3, 3),
+    1 << 2 | ENEMY: (500, 60, 8, 2),
+    0 << 2 | EFFECT: (10, 10, 4),
+}
+
+
+def test_full_snapshot_round_trip():
+    data = encode_snapshot(5, 0, 3, BASE, {})
+    assert decode_snapshot(data, {}) == (5, 3, BASE)
+
+
+def test_delta_snapshot_round_trip():
+    state = dict(BASE)
+    state[GLOBAL] = (0, 1, 19, 1, 0)
+    state[0 << 2 | PLAYER] = (290, 200, 1, 10)
+    del state[1 << 2 | ENEMY]
+    del state[0 << 2 | EFFECT]
+    state[2 << 2 | EFFECT] = (70, 30, 0)
+    data = encode_snapshot(9, 5, 8, state, BASE)
+    assert decode_snapshot(data, {5: BASE}) == (9, 8, state)
+    assert len(data) < len(encode_snapshot(9, 0, 8, state, {}))
+
+
+def test_unchanged_snapshot_is_tiny():
+    data = encode_snapshot(6, 5, 4, BASE, BASE)
+    assert len(data) == 6
+    assert decode_snapshot(data, {5: BASE}) == (6, 4, BASE)
+
+
+def test_unknown_baseline():
+    data = encode_snapshot(9, 5, 8, BASE, BASE)
+    assert decode_snapshot(data, {4: BASE}) is None
+
+
+def test_captured_rounds_round_trip():
+    init()
+    levels = LevelManager(tile_size, preload=False)
+    world = World(width, height, tile_size, "eyeball", levels.current.enemy_hp, map=levels.current.map,
+                  player_count=2, seed=3)
+    world.new_game(seed=3)
+    baselines = {}
+    previous = 0
+    for tick in range(1, 81):
+        world.step(['left', 'up', None, 'right', 'down'][tick // 8 % 5], tick % 5 == 0)
+        state = capture(world, levels.index, 1)
+        data = encode_snapshot(tick, previous, tick, state, baselines.get(previous, {}))
+        assert decode_snapshot(data, baselines) == (tick, tick, state)
+        assert len(data) < raw_size(state)
+        baselines[tick] = state
+        # every other tick is lost, the next one is coded against the last one that arrived
+        if tick % 2:
+            previous = tick
+        if world.stop:
+            break
@@ -0,0 +1,106 @@
+import pytest
+
+from headless import init, width, height, tile_size
+from levels import LevelManager
+from replay import Recorder, Round, load, replay, read_varint, write_varint, encode_input, decode_input, DIRECTIONS
+from world import World
+
+
+@pytest.mark.parametrize("value", [0, 1, 127, 128, 300, 16383, 16384, 2 ** 32 - 1, 2 ** 63])
+def test_varint_round_trip(value):
+    out = bytearray(b"x")
+    write_varint(out, value)
+    assert read_varint(out, 1) == (value, len(out))
+
+
+def test_varint_length():
+    for value, length in ((0, 1), (127, 1), (128, 2), (16383, 2), (16384, 3)):
+        out = bytearray()
+        write_varint(out, value)
+        assert len(out) == length
+
+
+def test_input_codes_round_trip():
+    codes = set()
+    for direction in DIRECTIONS:
+        for slash in (False, True):
+            code = encode_input(direction, slash)
+            assert decode_input(code) == (direction, slash)
+            codes.add(code)
+    assert len(codes) == len(DIRECTIONS) * 2
+
+
+def test_round_runs():
+    inputs = [('left', False)] * 5 + [('left', True)] + [(None, False)] * 300 + [('up', False)]
+    round = Round(1, 0, 3)
+    for direction, slash in inputs:
+        round.add(encode_input(direction, slash))
+    assert [repeat for _, repeat in round.runs] == [5, 1, 300, 1]
+    assert round.ticks == len(inputs)
+    assert list(round.inputs()) == inputs
+
+
+def test_save_load_round_trip(tmp_path):
+    recorder = Recorder("bee", 6, checksum_every=5, enemy_speed=2, equipment=["BODY_skeleton.png"], steps=8,
+                        round_time=30, dt=0.04)
+    for seed, level in ((12345, 0), (2 ** 32 - 1, 1)):
+        round = Round(seed, level, 4)
+        for tick in range(1, 41):
+            round.add(encode_input(DIRECTIONS[tick % 5], tick % 7 == 0))
+            if tick % 5 == 0:
+                round.checksums.append((tick, tick * 2654435761 % 2 ** 32))
+        recorder.rounds.append(round)
+    path = tmp_path / "round.rpl"
+    assert recorder.save(path) == path.stat().st_size
+
+    loaded = load(path)
+    assert loaded.enemy_type == "bee"
+    assert loaded.checksum_every == 5
+    assert loaded.world_options() == recorder.world_options()
+    assert len(loaded.rounds) == 2
+    for a, b in zip(recorder.rounds, loaded.rounds):
+        assert (a.seed, a.level, a.enemy_hp, a.ticks) == (b.seed, b.level, b.enemy_hp, b.ticks)
+        assert a.runs == b.runs
+        assert a.checksums == b.checksums
+
+
+def test_load_rejects_other_files(tmp_path):
+    path = tmp_path / "other.rpl"
+    path.write_bytes(b"PNG\x00" + bytes(16))
+    with pytest.raises(ValueError):
+        load(path)
+
+
+def record_round(ticks=60):
+    init()
+    levels = LevelManager(tile_size, preload=False)
+    world = World(width, height, tile_size, "eyeball", levels.current.enemy_hp, map=levels.current.map,
+                  enemy_speed=2)
+    recorder = Recorder("eyeball", world.enemy_count, enemy_speed=world.enemy_speed, equipment=world.equipment,
+                        steps=world.steps, round_time=world.round_time, dt=world.dt)
+    world.new_game(seed=7)
+    recorder.start_round(world, levels.index)
+    for tick in range(ticks):
+        direction, slash = DIRECTIONS[tick // 6 % 5], tick % 4 == 0
+        world.step(direction, slash)
+        recorder.record(world, direction, slash)
+        if world.stop:
+            break
+    return recorder
+
+
+def test_replay_matches_checksums(tmp_path):
+    path = tmp_path / "round.rpl"
+    record_round().save(path)
+    recording = load(path)
+    assert recording.rounds[0].checksums
+    assert replay(recording) == []
+
+
+def test_replay_reports_divergence(tmp_path):
+    path = tmp_path / "round.rpl"
+    record_round().save(path)
+    recording = load(path)
+    tick, checksum = recording.rounds[0].checksums[1]
+    recording.rounds[0].checksums[1] = (tick, checksum ^ 1)
+    assert replay(recording) == [(0, tick)]
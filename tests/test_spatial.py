@@ -0,0 +1,58 @@
+import random
+
+import pygame
+
+from spatial import SpatialHash
+
+
+def brute_force(rects, rect):
+    return [item for item, other in rects.items() if other.colliderect(rect)]
+
+
+def test_query_matches_brute_force():
+    rng = random.Random(1)
+    grid = SpatialHash(16)
+    rects = {}
+    for item in range(200):
+        rects[item] = pygame.Rect(rng.randrange(-50, 600), rng.randrange(-50, 400), rng.randrange(1, 60),
+                                  rng.randrange(1, 60))
+        grid.insert(item, rects[item])
+    for _ in range(100):
+        # moves within a cell, across cells and far away
+        item = rng.randrange(200)
+        rects[item] = rects[item].move(rng.choice((1, 17, 300)), rng.choice((-1, 0, 40)))
+        grid.move(item, rects[item])
+    for item in range(0, 200, 3):
+        grid.remove(item)
+        del rects[item]
+    assert len(grid) == len(rects)
+    for _ in range(300):
+        rect = pygame.Rect(rng.randrange(-50, 600), rng.randrange(-50, 400), rng.randrange(1, 80),
+                           rng.randrange(1, 80))
+        assert sorted(grid.query(rect)) == sorted(brute_force(rects, rect))
+
+
+def test_query_keeps_insertion_order():
+    grid = SpatialHash(16)
+    for item in "cab":
+        grid.insert(item, pygame.Rect(0, 0, 40, 40))
+    assert grid.query(pygame.Rect(20, 20, 40, 40)) == ["c", "a", "b"]
+    assert grid.first(pygame.Rect(30, 30, 5, 5)) == "c"
+
+
+def test_edges_do_not_touch():
+    grid = SpatialHash(16)
+    grid.insert("a", pygame.Rect(0, 0, 16, 16))
+    assert grid.query(pygame.Rect(16, 0, 16, 16)) == []
+    assert grid.query(pygame.Rect(15, 15, 1, 1)) == ["a"]
+
+
+def test_remove_frees_cells():
+    grid = SpatialHash(16)
+    grid.insert("a", pygame.Rect(0, 0, 40, 40))
+    grid.move("a", pygame.Rect(100, 100, 10, 10))
+    grid.remove("a")
+    grid.remove("a")
+    assert "a" not in grid
+    assert grid.cells == {}
+    assert grid.first(pygame.Rect(100, 100, 10, 10)) is None
@@ -0,0 +1,136 @@
+import weakref
+
+import pygame
+from pygame._sdl2.video import Window, Renderer, Texture
+from assets import frame_sources
+
+
+class TextureCache:
+    def __init__(self, renderer):
+        self.renderer = renderer
+        # both caches forget an entry together with its surface
+        self.textures = weakref.WeakKeyDictionary()
+        self.entries = weakref.WeakKeyDictionary()
+        self.uploads = 0
+
+    def texture(self, surface):
+        texture = self.textures.get(surface)
+        if texture is None:
+            texture = self.textures[surface] = Texture.from_surface(self.renderer, surface)
+            self.uploads += 1
+        return texture
+
+    def get(self, surface):
+        # returns the texture to draw a surface from and the part of it to copy (None for all of it)
+        entry = self.entries.get(surface)
+        if entry is None:
+            source = frame_sources.get(surface)
+            if source is not None:
+                # a frame cut from a sheet: the unscaled sheet is uploaded once, frames are scaled copies of it
+                sheet, area = source
+                entry = (self.texture(sheet), area)
+            elif surface.get_parent() is not None:
+                # an atlas frame is a subsurface of its page: the whole page is one texture
+                entry = (self.texture(surface.get_abs_parent()),
+                         pygame.Rect(surface.get_abs_offset(), surface.get_size()))
+            else:
+                entry = (self.texture(surface), None)
+            self.entries[surface] = entry
+        return entry
+
+    def stats(self):
+        return {"textures": len(self.textures), "surfaces": len(self.entries), "uploads": self.uploads}
+
+
+class TextureRenderer:
+    # stands in for the display surface: fill() and blits() record texture copies, present()
+    # draws them scaled from the game's resolution to the window and shows the result
+    def __init__(self, size, window_size=None, title="SKELE-HERO", accelerated=-1, vsync=False):
+        self.size = tuple(size)
+        self.window = Window(title, size=window_size or size)
+        self.renderer = Renderer(self.window, accelerated=accelerated, vsync=vsync)
+        self.renderer.logical_size = self.size
+        # a window larger than the game gets the frame drawn at game size first and then scaled
+        # in one copy, so the cost of the many small copies does not grow with the window
+        self.target = None
+        if tuple(self.window.size) != self.size:
+            self.target = Texture(self.renderer, self.size, target=True)
+            self.target.blend_mode = pygame.BLENDMODE_NONE
+        self.textures = TextureCache(self.renderer)
+        self.color = (0, 0, 0)
+        self.commands = []
+        # menus draw into surfaces they change in place; blit() puts them on a canvas uploaded at present()
+        self.canvas = pygame.Surface(self.size, pygame.SRCALPHA)
+        self.canvas_texture = None
+        self.canvas_used = False
+        # the parts of the canvas changed since the last upload; None means all of it
+        self.canvas_dirty = None
+        self.frames = 0
+        self.copies = 0
+
+    def get_size(self):
+        return self.size
+
+    def get_rect(self):
+        return pygame.Rect((0, 0), self.size)
+
+    def fill(self, color):
+        self.color = color
+        self.commands.clear()
+        if self.canvas_used:
+            self.canvas.fill((0, 0, 0, 0))
+            self.canvas_used = False
+            self.canvas_dirty = None
+
+    def blits(self, sequence, doreturn=True):
+        get = self.textures.get
+        first = len(self.commands)
+        for surface, dest in sequence:
+            texture, area = get(surface)
+            self.commands.append((texture, area, pygame.Rect(dest[0], dest[1], *surface.get_size())))
+        if doreturn:
+            return [rect for _, _, rect in self.commands[first:]]
+
+    def blit(self, surface, dest, area=None):
+        self.canvas_used = True
+        rect = self.canvas.blit(surface, dest, area)
+        if self.canvas_dirty is not None:
+            self.canvas_dirty.append(rect)
+        return rect
+
+    def window_to_game(self, pos):
+        width, height = self.window.size
+        return pos[0] * self.size[0] // width, pos[1] * self.size[1] // height
+
+    def present(self):
+        renderer = self.renderer
+        renderer.draw_color = tuple(pygame.Color(self.color))
+        if self.target is not None:
+            renderer.target = self.target
+        renderer.clear()
+        for texture, area, rect in self.commands:
+            texture.draw(srcrect=area, dstrect=rect)
+        if self.canvas_used:
+            if self.canvas_texture is None:
+                self.canvas_texture = Texture(renderer, self.size, streaming=True)
+                self.canvas_texture.blend_mode = pygame.BLENDMODE_BLEND
+            if self.canvas_dirty is None:
+                self.canvas_texture.update(self.canvas)
+            else:
+                # a menu that only changed a button uploads just that button
+                for rect in self.canvas_dirty:
+                    rect = rect.clip(self.canvas.get_rect())
+                    if rect.w and rect.h:
+                        self.canvas_texture.update(self.canvas.subsurface(rect), rect)
+            self.canvas_dirty = []
+            self.canvas_texture.draw()
+        if self.target is not None:
+            renderer.target = None
+            self.target.draw()
+        renderer.present()
+        self.frames += 1
+        self.copies += len(self.commands)
+
+    def stats(self):
+        return dict(self.textures.stats(), frames=self.frames,
+                    copies_per_frame=self.copies / self.frames if self.frames else 0)
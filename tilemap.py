@@ -0,0 +1,154 @@
+from collections import OrderedDict
+
+import pygame
+import pytmx
+
+CHUNK_TILES = 16
+# whole-layer surfaces are only baked for maps up to this many pixels a side;
+# bigger maps are drawn through the camera in chunks
+MAX_BAKE = 4096
+
+
+class Map:
+    def __init__(self, filename, tile_size):
+        self.map = pytmx.load_pygame(f"data/maps/{filename}")
+        self.height = self.map.height
+        self.width = self.map.width
+        self.tile_size = tile_size
+        self.layers = list(self.map.visible_tile_layers)
+        self.cache = {}
+        self.chunk_tiles = CHUNK_TILES
+        self.chunks = OrderedDict()
+        self.chunk_bakes = 0
+        self.wall_changes = 0
+        self.build_walls()
+
+    def is_solid(self, layer, gid):
+        if not gid:
+            return False
+        if self.map.layers[layer].properties.get("collision"):
+            return True
+        properties = self.map.get_tile_properties_by_gid(gid)
+        return bool(properties and properties.get("collides"))
+
+    def build_walls(self):
+        # one byte per tile: a tile is a wall if any layer has a colliding tile there
+        self.walls = bytearray(self.width * self.height)
+        for layer in self.layers:
+            for x, y, gid in self.map.layers[layer].iter_data():
+                if self.is_solid(layer, gid):
+                    self.walls[y * self.width + x] = 1
+
+    def update_wall(self, x, y):
+        solid = any(self.is_solid(layer, self.map.layers[layer].data[y][x]) for layer in self.layers)
+        self.walls[y * self.width + x] = solid
+        self.wall_changes += 1
+
+    def is_wall(self, x, y):
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return True
+        return self.walls[y * self.width + x] == 1
+
+    def walkable_point(self, pos):
+        return not self.is_wall(int(pos[0]) // self.tile_size, int(pos[1]) // self.tile_size)
+
+    def walkable_rect(self, rect):
+        x0, y0 = rect.left // self.tile_size, rect.top // self.tile_size
+        x1, y1 = (rect.right - 1) // self.tile_size, (rect.bottom - 1) // self.tile_size
+        for y in range(y0, y1 + 1):
+            for x in range(x0, x1 + 1):
+                if self.is_wall(x, y):
+                    return False
+        return True
+
+    def bake_layer(self, layer):
+        size = (self.width * self.tile_size, self.height * self.tile_size)
+        # the bottom layer sits on the black screen fill anyway, so it can be opaque
+        opaque = layer == self.layers[0]
+        if opaque:
+            surface = pygame.Surface(size)
+            surface.fill((0, 0, 0))
+        else:
+            surface = pygame.Surface(size, pygame.SRCALPHA)
+        for x, y, image in self.map.layers[layer].tiles():
+            surface.blit(image, (x * self.tile_size, y * self.tile_size))
+        if pygame.display.get_surface():
+            surface = surface.convert() if opaque else surface.convert_alpha()
+        self.cache[layer] = surface
+        return surface
+
+    def fits_bake(self):
+        return max(self.width, self.height) * self.tile_size <= MAX_BAKE
+
+    def bake(self):
+        if not self.fits_bake():
+            return
+        for layer in self.layers:
+            if layer not in self.cache:
+                self.bake_layer(layer)
+
+    def set_tile(self, x, y, layer, gid):
+        self.map.layers[layer].data[y][x] = gid
+        self.cache.pop(layer, None)
+        self.chunks.pop((x // self.chunk_tiles, y // self.chunk_tiles), None)
+        self.update_wall(x, y)
+
+    def surfaces(self):
+        sequence = []
+        for layer in self.layers:
+            surface = self.cache.get(layer)
+            if surface is None:
+                surface = self.bake_layer(layer)
+            sequence.append((surface, (0, 0)))
+        return sequence
+
+    def chunk_count(self):
+        size = self.chunk_tiles
+        return (self.width + size - 1) // size, (self.height + size - 1) // size
+
+    def bake_chunk(self, cx, cy):
+        # all layers of a chunk go into one opaque surface: the same pixels as the layers
+        # blitted one by one onto the black screen, in a single blit
+        size = self.chunk_tiles
+        x0, y0 = cx * size, cy * size
+        x1, y1 = min(x0 + size, self.width), min(y0 + size, self.height)
+        surface = pygame.Surface(((x1 - x0) * self.tile_size, (y1 - y0) * self.tile_size))
+        surface.fill((0, 0, 0))
+        for layer in self.layers:
+            data = self.map.layers[layer].data
+            images = self.map.images
+            sequence = []
+            for y in range(y0, y1):
+                row = data[y]
+                for x in range(x0, x1):
+                    image = images[row[x]] if row[x] else None
+                    if image:
+                        sequence.append((image, ((x - x0) * self.tile_size, (y - y0) * self.tile_size)))
+            surface.blits(sequence, doreturn=False)
+        if pygame.display.get_surface():
+            surface = surface.convert()
+        self.chunk_bakes += 1
+        return surface
+
+    def chunk(self, cx, cy):
+        key = (cx, cy)
+        surface = self.chunks.get(key)
+        if surface is None:
+            surface = self.chunks[key] = self.bake_chunk(cx, cy)
+        else:
+            self.chunks.move_to_end(key)
+        return surface
+
+    def evict_chunks(self, limit, keep=()):
+        # least recently drawn chunks go first; chunks in keep are never evicted
+        for key in list(self.chunks):
+            if len(self.chunks) <= limit:
+                break
+            if key not in keep:
+                del self.chunks[key]
+
+    def render(self, screen):
+        screen.blits(self.surfaces(), doreturn=False)
+
+    def get_tile_id(self, pos, layer=0):
+        return self.map.get_tile_gid(pos[0], pos[1], layer)
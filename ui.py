@@ -0,0 +1,74 @@
+import pygame
+
+# how long an idle screen sleeps in event.wait; shorter while the loader still has work to install
+IDLE_TIMEOUT = 1000
+BUSY_TIMEOUT = 50
+EXPOSE_EVENTS = (pygame.VIDEOEXPOSE, pygame.VIDEORESIZE, pygame.WINDOWEXPOSED, pygame.WINDOWRESIZED)
+
+
+class Button:
+    def __init__(self, x, y, w, h, text, font, size=(250, 50)):
+        self.btn_text = font.render(text, True, (0, 0, 0))
+        self.btn_rect = pygame.Rect(x, y, w, h)
+        self.rect = pygame.Rect((x, y), size)
+        # both looks are drawn once; hovering only switches between them
+        self.images = {False: self.render(size, False), True: self.render(size, True)}
+        self.hovered = False
+        self.drawn = None
+
+    def render(self, size, hovered):
+        w, h = size
+        surface = pygame.Surface(size)
+        pygame.draw.rect(surface, (0, 0, 0), (0, 0, w, h))
+        pygame.draw.rect(surface, (255, 255, 255), (1, 1, w - 2, h - 2))
+        pygame.draw.rect(surface, (0, 0, 0), (1, 1, w - 2, 1), 2)
+        pygame.draw.rect(surface, (0, 100, 0), (1, h - 2, w - 2, 10), 2)
+        if hovered:
+            pygame.draw.rect(surface, (200, 200, 200), (1, 1, w - 2, h - 2))
+        surface.blit(self.btn_text, self.btn_text.get_rect(center=(w / 2, h / 2)))
+        return surface
+
+    def collidebtn(self, mouse):
+        self.hovered = bool(self.btn_rect.collidepoint(mouse))
+
+    def invalidate(self):
+        self.drawn = None
+
+    def draw(self, screen):
+        # returns the rect it drew, or None when the screen already shows the current look
+        if self.drawn == self.hovered:
+            return None
+        self.drawn = self.hovered
+        return screen.blit(self.images[self.hovered], self.rect)
+
+
+class Menu:
+    def __init__(self, buttons):
+        self.buttons = buttons
+        self.redraws = 0
+
+    def hover(self, mouse):
+        for button in self.buttons:
+            button.collidebtn(mouse)
+
+    def clicked(self, mouse):
+        for button in self.buttons:
+            if button.btn_rect.collidepoint(mouse):
+                return button
+        return None
+
+    def invalidate(self):
+        for button in self.buttons:
+            button.invalidate()
+
+    def draw(self, screen):
+        rects = [rect for rect in (button.draw(screen) for button in self.buttons) if rect]
+        self.redraws += bool(rects)
+        return rects
+
+
+def wait_events(timeout=IDLE_TIMEOUT):
+    # sleeps until an event arrives or the timeout runs out, then takes whatever else is queued
+    event = pygame.event.wait(timeout)
+    events = [] if event.type == pygame.NOEVENT else [event]
+    return events + pygame.event.get()
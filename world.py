@@ -0,0 +1,222 @@
+import pygame
+import random
+import zlib
+from assets import load_frames
+from character import EQUIPMENT
+from entities import Player, Enemy
+from flowfield import FlowField
+from pool import Pool, Effects
+from spatial import SpatialHash
+
+FPS = 20
+DT = 1 / FPS
+ROUND_TIME = 20
+STEPS = 10
+
+ENEMIES = {
+    "eyeball": ("eyeball.png", 7, 4),
+    "pumpking": ("pumpking.png", 6, 4),
+    "bee": ("bee.png", 6, 4),
+}
+
+
+def read_direction(keys):
+    if keys[pygame.K_LEFT] or keys[ord('a')]:
+        return 'left'
+    elif keys[pygame.K_RIGHT] or keys[ord('d')]:
+        return 'right'
+    elif keys[pygame.K_UP] or keys[ord('w')]:
+        return 'up'
+    elif keys[pygame.K_DOWN] or keys[ord('s')]:
+        return 'down'
+    return None
+
+
+class World:
+    def __init__(self, width, height, tile_size, enemy_type, enemy_hp=3, dt=DT,
+                 steps=STEPS, round_time=ROUND_TIME, enemy_count=4, map=None, profiler=None,
+                 equipment=EQUIPMENT, seed=None, enemy_speed=0, player_count=1):
+        self.width = width
+        self.height = height
+        self.tile_size = tile_size
+        self.enemy_type = enemy_type
+        self.enemy_hp = enemy_hp
+        self.dt = dt
+        self.steps = steps
+        self.round_time = round_time
+        self.enemy_count = enemy_count
+        self.map = map
+        self.profiler = profiler
+        self.equipment = equipment
+        self.player_count = player_count
+        # with a speed, enemies walk to the player along a flow field shared by all of them
+        self.enemy_speed = enemy_speed
+        self.flow = None
+        # every round gets its own seed drawn from this one, so a single round can be replayed
+        self.rng = random.Random(seed)
+        self.offsets = {'left': (-steps, 0), 'right': (steps, 0), 'up': (0, -steps), 'down': (0, steps)}
+        self.player_group = pygame.sprite.Group()
+        self.enemy_group = pygame.sprite.Group()
+        # buckets span 4x4 map tiles: a sprite hitbox covers only a few of them
+        self.grid = SpatialHash(tile_size * 4)
+        # the players, the enemies and the explosions are reused from round to round
+        self.player = None
+        self.players = []
+        self.spawned = []
+        self.enemy_pool = Pool(self.make_enemy)
+        self.effects = Effects(load_frames("particles/explosion.png", 12, 1, 1.5)[0])
+        self.new_game()
+
+    def make_enemy(self, x, y, *groups, **kwargs):
+        sheet, columns, rows = ENEMIES[self.enemy_type]
+        return Enemy(sheet, x, y, columns, rows, *groups, **kwargs)
+
+    def new_game(self, seed=None):
+        self.seed = self.rng.getrandbits(32) if seed is None else seed
+        self.round_rng = random.Random(self.seed)
+        for enemy in self.spawned:
+            enemy.kill()
+            self.enemy_pool.release(enemy)
+        self.spawned = []
+        self.effects.clear()
+        self.grid.clear()
+        x, y = self.width / 2 - 40, self.height / 2 - 50
+        if not self.players:
+            # body and equipment are baked into one sprite, drawn with a single blit
+            self.players = [Player(self.equipment, x + i * 64, y, self.player_group) for i in range(self.player_count)]
+            self.player = self.players[0]
+        else:
+            for i, player in enumerate(self.players):
+                player.reset(x + i * 64, y)
+
+        rx, ry = [_ for _ in range(1, 15)], [_ for _ in range(1, 10)]
+        self.round_rng.shuffle(rx)
+        self.round_rng.shuffle(ry)
+        if self.enemy_type in ENEMIES:
+            for i in range(self.enemy_count):
+                enemy = self.enemy_pool.acquire(rx[i % len(rx)] * self.tile_size, ry[i % len(ry)] * self.tile_size,
+                                                self.enemy_group, max_hp=self.enemy_hp, rng=self.round_rng)
+                self.spawned.append(enemy)
+                self.grid.insert(enemy, enemy.hitbox)
+
+        self.kills = 0
+        self.ticks = 0
+        self.time = 0
+        self.counter = self.round_time
+        self.text = " " + str(self.counter)
+        self.stop = False
+        self.result = None
+
+    def can_move(self, dx, dy, player=None):
+        player = player or self.player
+        if self.map is not None:
+            return self.map.walkable_rect(player.feet.move(dx, dy))
+        # without a map keep the player inside the screen
+        if dx < 0:
+            return player.x > -10
+        if dx > 0:
+            return player.x < self.width - player.rect.width - 50
+        if dy < 0:
+            return player.y > -35
+        return player.y < self.height - player.rect.height - 100
+
+    def checksum(self):
+        state = [self.ticks, self.kills, self.counter, self.time, self.stop]
+        for player in self.players:
+            state += [player.x, player.y, player.direction, player.cur_frame, player.slashing, player.slash_frame,
+                      player.health.hp]
+        for enemy in self.enemy_group:
+            state += [enemy.rect.x, enemy.rect.y, enemy.health.hp, enemy.cur_frame, enemy.frame_time]
+        for effect in self.effects:
+            state += [effect.rect.x, effect.rect.y, effect.frame, effect.frame_time]
+        return zlib.crc32(repr(state).encode())
+
+    def chase(self):
+        if self.flow is None or self.flow.map is not self.map:
+            self.flow = FlowField(self.map)
+        player = self.player
+        self.flow.update(player.feet.center)
+        hitbox = player.hitbox
+        for enemy in self.enemy_group:
+            if not enemy.hitbox.colliderect(hitbox) and enemy.chase(self.flow, self.enemy_speed):
+                self.grid.move(enemy, enemy.hitbox)
+
+    def pool_stats(self):
+        return {"enemies": self.enemy_pool.stats(), "effects": self.effects.pool.stats()}
+
+    def end(self, result):
+        self.stop = True
+        self.result = result
+        self.text = ' VICTORY' if result == 'victory' else ' GAME OVER'
+
+    def animate_slash(self, player):
+        if player.slashing:
+            if player.direction == 'up':
+                player.image = player.sup[player.slash_frame]
+            elif player.direction == 'down':
+                player.image = player.sdown[player.slash_frame]
+            elif player.direction == 'left':
+                player.image = player.sleft[player.slash_frame]
+            elif player.direction == 'right':
+                player.image = player.sright[player.slash_frame]
+
+            player.slash_frame += 1
+            if player.slash_frame >= len(player.sup):
+                player.slashing = False
+                player.slash_frame = 0
+
+    def step(self, direction=None, slash=False, others=()):
+        # others holds (direction, slash) for the second and later players
+        if self.stop:
+            return True
+        self.ticks += 1
+        inputs = [(direction, slash)] + list(others)
+        inputs += [(None, False)] * (len(self.players) - len(inputs))
+
+        for player, (_, slash) in zip(self.players, inputs):
+            if slash:
+                self.kills = player.slash(self.kills, self.grid, self.effects)
+
+        self.time += self.dt
+        while self.time >= 1:
+            self.time -= 1
+            self.counter -= 1
+            if self.counter > 0:
+                self.text = " " + str(self.counter)
+            else:
+                self.end('game over')
+                return True
+
+        if not self.enemy_group and not self.effects:
+            self.end('victory')
+
+        for player, (direction, _) in zip(self.players, inputs):
+            dx, dy = self.offsets.get(direction, (0, 0))
+            if (dx or dy) and self.can_move(dx, dy, player):
+                player.move(dx, dy)
+                player.update(direction)
+
+            player.update(None)
+        if self.profiler is not None:
+            self.profiler.lap('player')
+
+        if self.enemy_speed and self.map is not None:
+            self.chase()
+        # an enemy touching several players bites the first of them
+        targets = {}
+        for player in reversed(self.players):
+            for enemy in self.grid.query(player.hitbox):
+                targets[enemy] = player
+        for enemy in self.enemy_group:
+            if enemy.update(self.dt, targets.get(enemy)) is True:
+                self.end('game over')
+        self.effects.update(self.dt)
+        if self.profiler is not None:
+            self.profiler.lap('enemies')
+
+        for player in self.players:
+            self.animate_slash(player)
+        if self.profiler is not None:
+            self.profiler.lap('player')
+
+        return self.stop